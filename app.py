@@ -1,92 +1,33 @@
+import functools
+import hmac
+import json
+import logging
+import os
+import threading
+
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output
 from dash.exceptions import PreventUpdate
+from flask import Response, abort, request, send_from_directory
 from tabs import tab1, tab2, tab3
 
-import pandas as pd
 import plotly.io as pio
+from plotly.io.json import to_json_plotly
 pio.templates.default="plotly_white"
 
-from helper_functions import calc_index, calc_CAGR, get_balanced_panel, trend_graph, bea_graph,month_graph, create_table
-
-us_state_to_abbrev={
-    "Alabama": "AL",
-    "Alaska": "AK",
-    "Arizona": "AZ",
-    "Arkansas": "AR",
-    "California": "CA",
-    "Colorado": "CO",
-    "Connecticut": "CT",
-    "Delaware": "DE",
-    "Florida": "FL",
-    "Georgia": "GA",
-    "Hawaii": "HI",
-    "Idaho": "ID",
-    "Illinois": "IL",
-    "Indiana": "IN",
-    "Iowa": "IA",
-    "Kansas": "KS",
-    "Kentucky": "KY",
-    "Louisiana": "LA",
-    "Maine": "ME",
-    "Maryland": "MD",
-    "Massachusetts": "MA",
-    "Michigan": "MI",
-    "Minnesota": "MN",
-    "Mississippi": "MS",
-    "Missouri": "MO",
-    "Montana": "MT",
-    "Nebraska": "NE",
-    "Nevada": "NV",
-    "New Hampshire": "NH",
-    "New Jersey": "NJ",
-    "New Mexico": "NM",
-    "New York": "NY",
-    "North Carolina": "NC",
-    "North Dakota": "ND",
-    "Ohio": "OH",
-    "Oklahoma": "OK",
-    "Oregon": "OR",
-    "Pennsylvania": "PA",
-    "Rhode Island": "RI",
-    "South Carolina": "SC",
-    "South Dakota": "SD",
-    "Tennessee": "TN",
-    "Texas": "TX",
-    "Utah": "UT",
-    "Vermont": "VT",
-    "Virginia": "VA",
-    "Washington": "WA",
-    "West Virginia": "WV",
-    "Wisconsin": "WI",
-    "Wyoming": "WY",
-    "District of Columbia": "DC",
-    "American Samoa": "AS",
-    "Guam": "GU",
-    "Northern Mariana Islands": "MP",
-    "Puerto Rico": "PR",
-    "United States Minor Outlying Islands": "UM",
-    "U.S. Virgin Islands": "VI",
-}
-    
-# invert the dictionary
-abbrev_to_us_state=dict(map(reversed, us_state_to_abbrev.items()))
-
-# Read data
-pop=pd.read_csv('https://raw.githubusercontent.com/garycl/EconApp/master/data/pop.csv')
-pop=get_balanced_panel(pop, datevar='Year', format='%Y')
-
-lau=pd.read_csv('https://raw.githubusercontent.com/garycl/EconApp/master/data/lau.csv')
-#lau=get_balanced_panel(lau, datevar='Year')
-lau=get_balanced_panel(lau, datevar='Date', format='%Y-%m-%d')
+import metrics
+from cache import figure_cache
+from profiling import CallbackProfiler
+from datasets import DatasetManager
+from helper_functions import trend_graph, bea_graph,month_graph, create_table
 
-bea=pd.read_csv('https://raw.githubusercontent.com/garycl/EconApp/master/data/bea.csv')
-bea=get_balanced_panel(bea, datevar='Year', format='%Y')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
 
-qcew=pd.read_csv('https://raw.githubusercontent.com/garycl/EconApp/master/data/qcew.csv')
-qcew=get_balanced_panel(qcew, datevar='Year', format='%Y')
+# Datasets are loaded the first time a tab or callback asks for them, and
+# new snapshot versions are swapped in without a restart
+datasets=DatasetManager()
 
 # App set-up
 app=dash.Dash(
@@ -99,6 +40,94 @@ app.title="Social and Economic Trends"
 server=app.server
 
 
+@server.route('/startup')
+def startup_stats():
+    data=datasets.active()
+    return {
+        'data_version': data.version,
+        'dataset_versions': data.dataset_versions,
+        'data_reloads': datasets.reloads,
+        'data_load_ms': {
+            name: round(seconds * 1000, 1)
+            for name, seconds in data.load_seconds.items()
+        },
+        'data_memory_bytes': {
+            name: sum(columns.values())
+            for name, columns in data.memory.items()
+        }
+    }
+
+
+@server.route('/coverage')
+def coverage():
+    return datasets.active().coverage
+
+
+# Admin routes need ECONAPP_ADMIN_TOKEN, sent as the X-Admin-Token header
+def admin_allowed():
+    token=os.environ.get('ECONAPP_ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+# Check for a new snapshot version now, loading it in the background
+@server.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    if not admin_allowed():
+        abort(403)
+    threading.Thread(target=datasets.reload, name='dataset-reload-now', daemon=True).start()
+    # Only this worker reloads now; the others on their next poll of CURRENT
+    return {
+        'data_version': datasets.version,
+        'other_workers_within_s': datasets.interval or None,
+    }, 202
+
+
+# Profile the next matching callback request (see profiling.py)
+profiler=CallbackProfiler()
+server.view_functions['/_dash-update-component']=profiler.wrap(
+    server.view_functions['/_dash-update-component'], admin_allowed
+)
+
+
+@server.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    if not admin_allowed():
+        abort(403)
+    try:
+        spec=profiler.arm(
+            callback=request.args.get('callback'),
+            match=request.args.get('match'),
+            mode=request.args.get('mode', 'cprofile')
+        )
+    except ValueError as error:
+        return {'error': str(error)}, 400
+    return spec, 202
+
+
+@server.route('/admin/profiles')
+def admin_profiles():
+    if not admin_allowed():
+        abort(403)
+    return {'armed': profiler.armed(), 'profiles': profiler.profiles()}
+
+
+@server.route('/admin/profiles/<path:file>')
+def admin_profile_file(file):
+    if not admin_allowed():
+        abort(403)
+    return send_from_directory(profiler.profile_dir, file, as_attachment=True)
+
+
+@server.route('/metrics')
+def metrics_text():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@server.route('/cache-stats')
+def cache_stats():
+    return figure_cache.stats()
+
+
 tab_style = {
     'background-color': '#f8f9fa',
     'border-color':'#1b9e77',
@@ -136,179 +165,182 @@ app.layout=html.Div(
     style={'margin-left': '20%'}
 )
 
+# Tab modules and the dataset behind their area dropdown
+TABS={
+    'tab-1': (tab1, 'pop'),
+    'tab-2': (tab2, 'lau'),
+    'tab-3': (tab3, 'bea'),
+}
+
+
+# Serialized once per dataset version; switching tabs is a lookup
+@functools.lru_cache(maxsize=8)
+def tab_layout(version, tab):
+    module, name=TABS[tab]
+    layout=module.create_layout(datasets.areas(name).local_options)
+    return json.loads(to_json_plotly(layout))
+
+
 @app.callback(
     Output('tabs-content', 'children'),
     [Input('tabs', 'value')]
 )
+@datasets.pinned
 def render_content(tab):
-    if tab == 'tab-1':
-        return tab1.create_layout(pop)
-    elif tab == 'tab-2':
-        return tab2.create_layout(lau)
-    elif tab == 'tab-3':
-        return tab3.create_layout(bea)
+    if tab not in TABS:
+        raise PreventUpdate
+    return tab_layout(datasets.dataset_version(TABS[tab][1]), tab)
+
+
+# Formatted table records, reused whatever the chart options
+@functools.lru_cache(maxsize=256)
+def table_records(version, name, msa, yvar, format):
+    state_name=datasets.areas(name).primary_state[msa]
+    data=datasets.annual(name).frame(['United States', state_name, msa], [yvar])
+    table=create_table(data, state_name, msa, yvar, format)
+    columns=[{"name": i, "id": i} for i in table.columns]
+    return columns, table.to_dict('records')
+
+
+def data_table(name, msa, yvar, format):
+    columns, records=table_records(datasets.dataset_version(name), name, msa, yvar, format)
+    return dash_table.DataTable(
+        columns=columns,
+        data=records,
+        fixed_rows={'headers': True},
+        style_table={'height': 400},  # defaults to 500
+        style_cell={
+            'fontSize':16, 
+            'font-family':'sans-serif', 
+            'textAlign':'right',
+        },
+        style_header={
+            'fontWeight': 'bold', 
+        },
+        export_format="csv"
+    )
 
 
 # Tab 1 callback
 @app.callback(
-    Output('graph-1', 'figure'),
+    Output('graph-1-figure', 'data'),
     Output('table-1', 'children'),
     Input('msa_dropdown', 'value'),
     Input('recession', 'value'),
-    Input('nation_adj-1', 'value'),
-    Input('nation_slider-1', 'value'),
-    Input('state_adj-1', 'value'),
-    Input('state_slider-1', 'value'),
-    Input('msa_adj-1', 'value'),
-    Input('msa_slider-1', 'value'),
 )
     
 # chart
-def update_tab1_graph(
-    msa, recession, 
-    nation_adj, nation_slider,
-    state_adj, state_slider,
-    msa_adj, msa_slider):
+@datasets.pinned
+@metrics.timed('pop')
+@figure_cache.memoize(lambda: datasets.dataset_version('pop'))
+def update_tab1_graph(msa, recession):
             
     if msa is None:
         raise PreventUpdate
-    else:
-        state_abbrev=msa.split(', ')[1].strip().split('-')[0].strip()
-        state_name=abbrev_to_us_state[state_abbrev]
-
-    data=pop.copy()
-    df=data[(data.Area=='United States') | (data.Area==state_name) | (data.Area==msa)].copy()
-    df=calc_index(df, 'Population')
-    df=calc_CAGR(df, 'Index')
+    with metrics.stage('data'):
+        state_name=datasets.areas('pop').primary_state[msa]
+        df=datasets.growth('pop').frame(['United States', state_name, msa], 'Population')
             
     x0=df.Year.min()
-    fig=trend_graph(
-        df, state_name, msa, 'Index', recession,
-        title=f"Population Growth Index ({x0} Level=100)",
-        xaxis_title="Calendar Year",
-        yaxis_title="Index",
-        nation_adj=nation_adj,
-        nation_slider=nation_slider,
-        state_adj=state_adj,
-        state_slider=state_slider,
-        msa_adj=msa_adj,
-        msa_slider=msa_slider
-    )
-
-    table=create_table(data, state_name, msa, 'Population', 'Thousands')
-    table=dash_table.DataTable(
-            columns=[{"name": i, "id": i} for i in table.columns],
-            data=table.to_dict('records'),
-            fixed_rows={'headers': True},
-            style_table={'height': 400},  # defaults to 500
-            style_cell={
-                'fontSize':16, 
-                'font-family':'sans-serif', 
-                'textAlign':'right',
-            },
-            style_header={
-                'fontWeight': 'bold', 
-            },
-            export_format="csv"
+    with metrics.stage('figure'):
+        fig=trend_graph(
+            df, state_name, msa, 'Index', recession,
+            title=f"Population Growth Index ({x0} Level=100)",
+            xaxis_title="Calendar Year",
+            yaxis_title="Index"
         )
+
+    with metrics.stage('table'):
+        table=data_table('pop', msa, 'Population', 'Thousands')
     return  fig, table
 
+# Annotation offsets are applied in the browser (assets/annotations.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='annotations', function_name='annual'),
+    Output('graph-1', 'figure'),
+    Input('graph-1-figure', 'data'),
+    Input('nation_adj-1', 'value'),
+    Input('nation_slider-1', 'value'),
+    Input('state_adj-1', 'value'),
+    Input('state_slider-1', 'value'),
+    Input('msa_adj-1', 'value'),
+    Input('msa_slider-1', 'value'),
+)
+
 # Tab2 Callback
 @app.callback(
     Output('area_dropdown', 'options'),
     Input('type_dropdown', 'value')
 )
+@datasets.pinned
 def update_area(type):
-    area_list = (
-        lau.loc[lau.Type==type, 'Area']
-            .copy()
-            .sort_values().unique()
-    )
-    return [{'label':area, 'value':area} for area in area_list]
+    return datasets.areas('lau').options.get(type, [])
 
 
+# Series shared by the Labor Market callbacks
+@functools.lru_cache(maxsize=64)
+def lau_series(version, msa, yvar):
+    state_name=datasets.areas('lau').primary_state[msa]
+    areas=['United States', state_name, msa]
+    df=datasets.growth('lau', 2000, 2021).annual_frame(areas, yvar)
+    df_m=datasets.growth('lau', 2020).frame(areas, yvar)
+    return state_name, df, df_m
+
+
+# Annual chart
 @app.callback(
-    Output('graph-2', 'figure'),
-    Output('graph-month-2', 'figure'),
-    Output('table-2', 'children'),
+    Output('graph-2-figure', 'data'),
     Input('area_dropdown', 'value'),
     Input('yvar_dropdown', 'value'),
     Input('recession', 'value'),
-    Input('nation_adj-2', 'value'),
-    Input('nation_slider-2', 'value'),
-    Input('state_adj-2', 'value'),
-    Input('state_slider-2', 'value'),
-    Input('msa_adj-2', 'value'),
-    Input('msa_slider-2', 'value'),
-    Input('nation_apr_adj-2', 'value'),
-    Input('nation_apr_slider-2', 'value'),
-    Input('state_apr_adj-2', 'value'),
-    Input('state_apr_slider-2', 'value'),
-    Input('msa_apr_adj-2', 'value'),
-    Input('msa_apr_slider-2', 'value'),
-    Input('nation_m_adj-2', 'value'),
-    Input('nation_m_slider-2', 'value'),
-    Input('state_m_adj-2', 'value'),
-    Input('state_m_slider-2', 'value'),
-    Input('msa_m_adj-2', 'value'),
-    Input('msa_m_slider-2', 'value'),
 )
-
-# chart
-def update_tab2_graph(
-    msa, yvar, recession, 
-    nation_adj, nation_slider,
-    state_adj, state_slider,
-    msa_adj, msa_slider,
-    nation_apr_adj, nation_apr_slider,
-    state_apr_adj, state_apr_slider,
-    msa_apr_adj, msa_apr_slider,
-    nation_m_adj, nation_m_slider,
-    state_m_adj, state_m_slider,
-    msa_m_adj, msa_m_slider):
+@datasets.pinned
+@metrics.timed('lau')
+@figure_cache.memoize(lambda: datasets.dataset_version('lau'))
+def update_tab2_graph(msa, yvar, recession):
             
     if msa is None:
         raise PreventUpdate
-    else:
-        state_abbrev=msa.split(', ')[1].strip().split('-')[0].strip()
-        state_name=abbrev_to_us_state[state_abbrev]
-
-    data=lau.copy()
-    df=data[(data.Area=='United States') | (data.Area==state_name) | (data.Area==msa)].copy()
-    df=df[(df.Year>=2000) & (df.Year<=2021)]
-    df=df[['Area', 'Date', 'Year', 'Type', yvar]]
-    df=calc_index(df, yvar)
-    df=calc_CAGR(df, 'Index')
+    with metrics.stage('data'):
+        state_name, df, _=lau_series(datasets.dataset_version('lau'), msa, yvar)
+        df=df.copy()
             
     x0=int(df.Year.min())
     if yvar=='Unemployment Rate':
         title="Annual Average Unemployment Rate (Seasonally Adjusted)"
         yaxis_title="Percentage"
         yvarname=yvar
-        table=create_table(data, state_name, msa, yvar, 'Percentage')
     else:
         title=f"{yvar} Growth Index ({x0} Level=100)"
         yaxis_title="Index"
         yvarname='Index'
-        table=create_table(data, state_name, msa, yvar, 'Thousands')
-
-    fig=trend_graph(
-        df, state_name, msa, yvarname, recession,
-        title=title,
-        xaxis_title="Calendar Year",
-        yaxis_title=yaxis_title,
-        nation_adj=nation_adj,
-        nation_slider=nation_slider,
-        state_adj=state_adj,
-        state_slider=state_slider,
-        msa_adj=msa_adj,
-        msa_slider=msa_slider
-    )
 
-    df_m=data[(data.Area=='United States') | (data.Area==state_name) | (data.Area==msa)].copy()
-    df_m=df_m[df_m.Year>=2020]
-    df_m=df_m[['Area', 'Date', 'Year', 'Type', yvar]]
-    df_m=calc_index(df_m, yvar, 'Date')
+    with metrics.stage('figure'):
+        fig=trend_graph(
+            df, state_name, msa, yvarname, recession,
+            title=title,
+            xaxis_title="Calendar Year",
+            yaxis_title=yaxis_title
+        )
+    return fig
+
+# Monthly chart
+@app.callback(
+    Output('graph-month-2-figure', 'data'),
+    Input('area_dropdown', 'value'),
+    Input('yvar_dropdown', 'value'),
+    Input('recession', 'value'),
+)
+@datasets.pinned
+@metrics.timed('lau')
+@figure_cache.memoize(lambda: datasets.dataset_version('lau'))
+def update_tab2_month_graph(msa, yvar, recession):
+
+    if msa is None:
+        raise PreventUpdate
+    with metrics.stage('data'):
+        state_name, _, df_m=lau_series(datasets.dataset_version('lau'), msa, yvar)
+        df_m=df_m.copy()
 
     x0_year=df_m.Date.dt.year.min()
     x0_month = df_m[df_m.Date.dt.year==x0_year].Date.min().month_name()
@@ -320,116 +352,128 @@ def update_tab2_graph(
         title=f"{yvar} Growth Index ({x0_month} {x0_year} Level=100)"
         yaxis_title="Index"
         yvarname='Index'
-    fig2=month_graph(
-        df_m, state_name, msa, yvarname, recession,
-        title=title,
-        xaxis_title="Date",
-        yaxis_title=yaxis_title,
-        nation_apr_adj=nation_apr_adj,
-        nation_apr_slider=nation_apr_slider,
-        state_apr_adj=state_apr_adj,
-        state_apr_slider=state_apr_slider,
-        msa_apr_adj=msa_apr_adj,
-        msa_apr_slider=msa_apr_slider,
-        nation_m_adj=nation_m_adj,
-        nation_m_slider=nation_m_slider,
-        state_m_adj=state_m_adj,
-        state_m_slider=state_m_slider,
-        msa_m_adj=msa_m_adj,
-        msa_m_slider=msa_m_slider
-    )
-
-    table=dash_table.DataTable(
-            columns=[{"name": i, "id": i} for i in table.columns],
-            data=table.to_dict('records'),
-            fixed_rows={'headers': True},
-            style_table={'height': 400},  # defaults to 500
-            style_cell={
-                'fontSize':16, 
-                'font-family':'sans-serif', 
-                'textAlign':'right',
-            },
-            style_header={
-                'fontWeight': 'bold', 
-            },
-            export_format="csv"
+    with metrics.stage('figure'):
+        fig=month_graph(
+            df_m, state_name, msa, yvarname, recession,
+            title=title,
+            xaxis_title="Date",
+            yaxis_title=yaxis_title
         )
-    return  fig, fig2, table
+    return fig
+
+# Table
+@app.callback(
+    Output('table-2', 'children'),
+    Input('area_dropdown', 'value'),
+    Input('yvar_dropdown', 'value'),
+)
+@datasets.pinned
+@metrics.timed('lau')
+@figure_cache.memoize(lambda: datasets.dataset_version('lau'))
+def update_tab2_table(msa, yvar):
+
+    if msa is None:
+        raise PreventUpdate
+    with metrics.stage('table'):
+        if yvar=='Unemployment Rate':
+            table=data_table('lau', msa, yvar, 'Percentage')
+        else:
+            table=data_table('lau', msa, yvar, 'Thousands')
+
+    return table
+
+# Annual graph label offsets
+app.clientside_callback(
+    ClientsideFunction(namespace='annotations', function_name='annual'),
+    Output('graph-2', 'figure'),
+    Input('graph-2-figure', 'data'),
+    Input('nation_adj-2', 'value'),
+    Input('nation_slider-2', 'value'),
+    Input('state_adj-2', 'value'),
+    Input('state_slider-2', 'value'),
+    Input('msa_adj-2', 'value'),
+    Input('msa_slider-2', 'value'),
+)
+
+# Monthly graph label offsets
+app.clientside_callback(
+    ClientsideFunction(namespace='annotations', function_name='monthly'),
+    Output('graph-month-2', 'figure'),
+    Input('graph-month-2-figure', 'data'),
+    Input('nation_apr_adj-2', 'value'),
+    Input('nation_apr_slider-2', 'value'),
+    Input('state_apr_adj-2', 'value'),
+    Input('state_apr_slider-2', 'value'),
+    Input('msa_apr_adj-2', 'value'),
+    Input('msa_apr_slider-2', 'value'),
+    Input('nation_m_adj-2', 'value'),
+    Input('nation_m_slider-2', 'value'),
+    Input('state_m_adj-2', 'value'),
+    Input('state_m_slider-2', 'value'),
+    Input('msa_m_adj-2', 'value'),
+    Input('msa_m_slider-2', 'value'),
+)
 
 # Tab 3
 @app.callback(
-    Output('graph-3', 'figure'),
+    Output('graph-3-figure', 'data'),
     Output('table-3', 'children'),
     Input('area_dropdown', 'value'),
     Input('yvar_dropdown', 'value'),
     Input('recession', 'value'),
-    Input('nation_adj-3', 'value'),
-    Input('nation_slider-3', 'value'),
-    Input('state_adj-3', 'value'),
-    Input('state_slider-3', 'value'),
-    Input('msa_adj-3', 'value'),
-    Input('msa_slider-3', 'value')
 )
 
 # chart
-def display_tab3_chart(
-    msa, yvar, recession,
-    nation_adj, nation_slider,
-    state_adj, state_slider,
-    msa_adj, msa_slider):
+@datasets.pinned
+@metrics.timed('bea')
+@figure_cache.memoize(lambda: datasets.dataset_version('bea'))
+def display_tab3_chart(msa, yvar, recession):
         
     if msa is None:
         raise PreventUpdate
-    else:
-        state_abbrev=msa.split(', ')[1].strip().split('-')[0].strip()
-        state_name=abbrev_to_us_state[state_abbrev]
-
-    data=bea.copy()
-    df=data[(bea.Area=='United States') | (data.Area==state_name) | (data.Area==msa)].copy()
-    df=df[['Area', 'Date', 'Year', 'Type', yvar]]
-    df=calc_index(df, yvar)
-    df=calc_CAGR(df, 'Index')
+    with metrics.stage('data'):
+        state_name=datasets.areas('bea').primary_state[msa]
+        df=datasets.growth('bea').frame(['United States', state_name, msa], yvar)
         
     x0=df.Year.min()
     if yvar=='Real Per Capita Personal Income':
         title="Real Per Capita Personal Income (2012 Dollars)"
         yaxis_title="Thousand Dollars"
         yvarname=yvar
-        table=create_table(data, state_name, msa, yvar, 'Thousands')
     elif yvar=="Real GDP (Millions)":
         title=f"Real GDP Growth Index ({x0} Level=100)"
         yaxis_title="Index"
         yvarname='Index'
-        table=create_table(data, state_name, msa, yvar, 'Thousands')
-    fig=bea_graph(
-        df, state_name, msa, yvarname, recession,
-        title=title,
-        xaxis_title="Calendar Year",
-        yaxis_title=yaxis_title,
-        nation_adj=nation_adj,
-        nation_slider=nation_slider,
-        state_adj=state_adj,
-        state_slider=state_slider,
-        msa_adj=msa_adj,
-        msa_slider=msa_slider
-    )
+    with metrics.stage('table'):
+        table=data_table('bea', msa, yvar, 'Thousands')
+    with metrics.stage('figure'):
+        fig=bea_graph(
+            df, state_name, msa, yvarname, recession,
+            title=title,
+            xaxis_title="Calendar Year",
+            yaxis_title=yaxis_title
+        )
 
-    table=dash_table.DataTable(
-        columns=[{"name": i, "id": i} for i in table.columns],
-        data=table.to_dict('records'),
-        fixed_rows={'headers': True},
-        style_table={'height': 400},  # defaults to 500
-        style_cell={
-            'fontSize':16, 
-            'font-family':'sans-serif', 
-            'textAlign':'right',
-        },
-        style_header={
-            'fontWeight': 'bold', 
-        },
-        export_format="csv"
-    )
     return  fig, table
 
+# Label offsets
+app.clientside_callback(
+    ClientsideFunction(namespace='annotations', function_name='annual'),
+    Output('graph-3', 'figure'),
+    Input('graph-3-figure', 'data'),
+    Input('nation_adj-3', 'value'),
+    Input('nation_slider-3', 'value'),
+    Input('state_adj-3', 'value'),
+    Input('state_slider-3', 'value'),
+    Input('msa_adj-3', 'value'),
+    Input('msa_slider-3', 'value'),
+)
+
+# Outputs are cached per dataset version; drop those of datasets that changed
+@datasets.on_swap
+def invalidate_caches(old, new):
+    for name in new.changed_since(old):
+        figure_cache.invalidate(old.dataset_version(name))
+
 if __name__ == '__main__':
     app.run_server(debug=True)
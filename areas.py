@@ -0,0 +1,98 @@
+import numpy as np
+
+us_state_to_abbrev={
+    "Alabama": "AL",
+    "Alaska": "AK",
+    "Arizona": "AZ",
+    "Arkansas": "AR",
+    "California": "CA",
+    "Colorado": "CO",
+    "Connecticut": "CT",
+    "Delaware": "DE",
+    "Florida": "FL",
+    "Georgia": "GA",
+    "Hawaii": "HI",
+    "Idaho": "ID",
+    "Illinois": "IL",
+    "Indiana": "IN",
+    "Iowa": "IA",
+    "Kansas": "KS",
+    "Kentucky": "KY",
+    "Louisiana": "LA",
+    "Maine": "ME",
+    "Maryland": "MD",
+    "Massachusetts": "MA",
+    "Michigan": "MI",
+    "Minnesota": "MN",
+    "Mississippi": "MS",
+    "Missouri": "MO",
+    "Montana": "MT",
+    "Nebraska": "NE",
+    "Nevada": "NV",
+    "New Hampshire": "NH",
+    "New Jersey": "NJ",
+    "New Mexico": "NM",
+    "New York": "NY",
+    "North Carolina": "NC",
+    "North Dakota": "ND",
+    "Ohio": "OH",
+    "Oklahoma": "OK",
+    "Oregon": "OR",
+    "Pennsylvania": "PA",
+    "Rhode Island": "RI",
+    "South Carolina": "SC",
+    "South Dakota": "SD",
+    "Tennessee": "TN",
+    "Texas": "TX",
+    "Utah": "UT",
+    "Vermont": "VT",
+    "Virginia": "VA",
+    "Washington": "WA",
+    "West Virginia": "WV",
+    "Wisconsin": "WI",
+    "Wyoming": "WY",
+    "District of Columbia": "DC",
+    "American Samoa": "AS",
+    "Guam": "GU",
+    "Northern Mariana Islands": "MP",
+    "Puerto Rico": "PR",
+    "United States Minor Outlying Islands": "UM",
+    "U.S. Virgin Islands": "VI",
+}
+
+# invert the dictionary
+abbrev_to_us_state=dict(map(reversed, us_state_to_abbrev.items()))
+
+
+# Area types left out of the MSA dropdowns
+STATEWIDE_TYPES=('Nation', 'State')
+
+
+def parse_states(area):
+    """State names of an MSA or NECTA, from the abbreviations after its last comma.
+
+    'New York-Newark-Jersey City, NY-NJ-PA' gives New York, New Jersey and
+    Pennsylvania; a trailing ' NECTA' is ignored. Unknown codes are skipped.
+    """
+    if ', ' not in area:
+        return []
+    codes=area.rsplit(', ', 1)[1].split(' ')[0].split('-')
+    return [abbrev_to_us_state[code.strip()] for code in codes if code.strip() in abbrev_to_us_state]
+
+
+class AreaIndex:
+    """Dropdown options and area to state lookups of one dataset, built once per load."""
+
+    def __init__(self, cube):
+        areas=cube.areas
+        types=cube.types
+
+        # Options per Type, and for every area below the state level, sorted by
+        # name; both lists hold the same option dicts
+        option={area: {'label': area, 'value': area} for area in areas}
+        self.options={type: [option[area] for area in areas[types==type]] for type in np.unique(types)}
+        local=~np.isin(types, STATEWIDE_TYPES)
+        self.local_options=[option[area] for area in areas[local]]
+
+        self.states={area: parse_states(area) for area in areas[local]}
+        self.primary_state={area: states[0] for area, states in self.states.items() if states}
@@ -0,0 +1,39 @@
+// Annotation offsets are applied in the browser so the sliders never hit the server
+function shiftLabels(figure, names, values) {
+    if (!figure) {
+        return window.dash_clientside.no_update;
+    }
+    var offsets = {};
+    for (var i = 0; i < names.length; i++) {
+        var up = values[2 * i];
+        var slider = values[2 * i + 1] || 0;
+        offsets[names[i]] = up ? slider : -slider;
+    }
+    var annotations = (figure.layout.annotations || []).map(function (annotation) {
+        var offset = offsets[annotation.name];
+        if (!offset) {
+            return annotation;
+        }
+        return Object.assign({}, annotation, {y: annotation.y + offset});
+    });
+    return Object.assign({}, figure, {
+        layout: Object.assign({}, figure.layout, {annotations: annotations})
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    annotations: {
+        annual: function (figure) {
+            var values = Array.prototype.slice.call(arguments, 1);
+            return shiftLabels(figure, ['nation', 'state', 'msa'], values);
+        },
+        monthly: function (figure) {
+            var values = Array.prototype.slice.call(arguments, 1);
+            return shiftLabels(
+                figure,
+                ['nation_apr', 'state_apr', 'msa_apr', 'nation_m', 'state_m', 'msa_m'],
+                values
+            );
+        }
+    }
+});
@@ -0,0 +1,205 @@
+"""Time the tab callbacks for every area, variable and recession setting, without a browser.
+
+    python benchmarks/bench_callbacks.py [--output results.json] [--compare base.json]
+                                          [--limit N] [--cached] [--memory]
+
+Each callback runs uncached unless --cached: the figure cache is bypassed and
+the memoized series and tables of app.py are cleared before every call.
+Results hold p50/p95/max latency per callback, the time spent in each stage
+(see metrics.py) and peak memory, and are saved as JSON so that two commits
+can be compared with --compare.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import metrics
+from cache import bypass
+
+
+# Options of a dropdown in a serialized tab layout
+def dropdown_options(layout, component_id):
+    if isinstance(layout, dict):
+        props=layout.get('props', {})
+        if props.get('id')==component_id:
+            return [option['value'] for option in props['options']]
+        children=props.get('children')
+        return dropdown_options(children, component_id) if children is not None else None
+    if isinstance(layout, list):
+        for child in layout:
+            options=dropdown_options(child, component_id)
+            if options is not None:
+                return options
+    return None
+
+
+# (callback name, function, arguments) for every combination the tabs offer
+def cases(limit=None):
+    datasets=app.datasets
+    pop=[option['value'] for option in datasets.areas('pop').local_options][:limit]
+    lau=[option['value'] for option in datasets.areas('lau').local_options][:limit]
+    bea=[option['value'] for option in datasets.areas('bea').local_options][:limit]
+    lau_vars=dropdown_options(app.tab_layout(datasets.dataset_version('lau'), 'tab-2'), 'yvar_dropdown')
+    bea_vars=dropdown_options(app.tab_layout(datasets.dataset_version('bea'), 'tab-3'), 'yvar_dropdown')
+
+    for recession in (True, False):
+        for msa in pop:
+            yield 'update_tab1_graph', app.update_tab1_graph, (msa, recession)
+        for msa in lau:
+            for yvar in lau_vars:
+                yield 'update_tab2_graph', app.update_tab2_graph, (msa, yvar, recession)
+                yield 'update_tab2_month_graph', app.update_tab2_month_graph, (msa, yvar, recession)
+                if recession:
+                    yield 'update_tab2_table', app.update_tab2_table, (msa, yvar)
+        for msa in bea:
+            for yvar in bea_vars:
+                yield 'display_tab3_chart', app.display_tab3_chart, (msa, yvar, recession)
+
+
+# Series and table helpers that app.py memoizes per dataset version
+def _clear_memoized():
+    for cached_function in (app.table_records, app.lau_series):
+        cached_function.cache_clear()
+
+
+def run(limit=None, cached=False, memory=False):
+    # Dash's wrapper needs a request context; call the function it wraps
+    all_cases=[(name, func.__wrapped__, args) for name, func, args in cases(limit)]
+
+    # One call of each callback first, so that lazy loading is not timed
+    warmed=set()
+    for name, func, args in all_cases:
+        if name not in warmed:
+            warmed.add(name)
+            func(*args)
+    app.figure_cache.clear()
+    _clear_memoized()
+    metrics.STAGE_SECONDS.reset()
+    gc.collect()
+
+    if memory:
+        tracemalloc.start()
+    latencies={}
+    errors={}
+    start_time=time.perf_counter()
+    for name, func, args in all_cases:
+        if not cached:
+            _clear_memoized()
+        call_start=time.perf_counter()
+        try:
+            if cached:
+                func(*args)
+            else:
+                with bypass():
+                    func(*args)
+        except Exception as error:
+            errors.setdefault(name, []).append([list(args), repr(error)])
+            continue
+        latencies.setdefault(name, []).append(time.perf_counter()-call_start)
+    wall=time.perf_counter()-start_time
+    peak=tracemalloc.get_traced_memory()[1] if memory else None
+    if memory:
+        tracemalloc.stop()
+
+    stages={}
+    for (callback, dataset, stage), (count, total) in metrics.STAGE_SECONDS.totals().items():
+        stages.setdefault(callback, {})[stage]={'calls': count, 'total_ms': round(total * 1000, 2)}
+
+    callbacks={}
+    for name, times in latencies.items():
+        ms=np.array(times) * 1000
+        callbacks[name]={
+            'calls': len(ms),
+            'errors': len(errors.get(name, [])),
+            'p50_ms': round(float(np.percentile(ms, 50)), 3),
+            'p95_ms': round(float(np.percentile(ms, 95)), 3),
+            'max_ms': round(float(ms.max()), 3),
+            'mean_ms': round(float(ms.mean()), 3),
+            'total_ms': round(float(ms.sum()), 1),
+            'stages': stages.get(name, {}),
+        }
+        for stage in callbacks[name]['stages'].values():
+            stage['share']=round(stage['total_ms'] / callbacks[name]['total_ms'], 3)
+
+    return {
+        'commit': _commit(),
+        'started': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'data_version': app.datasets.version,
+        'cached': cached,
+        'limit': limit,
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plotly': plotly.__version__,
+        },
+        'wall_s': round(wall, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'peak_traced_mb': None if peak is None else round(peak / 2**20, 1),
+        'callbacks': callbacks,
+        'errors': errors,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def report(results, base=None):
+    print(f"commit {results['commit']}  data {results['data_version']}  wall {results['wall_s']} s  "
+          f"max RSS {results['max_rss_mb']} MB  peak traced {results['peak_traced_mb']} MB")
+    header=f"{'callback':<26}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    if base is not None:
+        header+=f"{'p50 vs base':>14}{'p95 vs base':>14}"
+    print(header)
+    for name, stats in results['callbacks'].items():
+        line=f"{name:<26}{stats['calls']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        old=(base or {}).get('callbacks', {}).get(name)
+        if old:
+            line+=f"{stats['p50_ms']/old['p50_ms']:>13.2f}x{stats['p95_ms']/old['p95_ms']:>13.2f}x"
+        print(line)
+        stages=sorted(stats['stages'].items(), key=lambda item: -item[1]['total_ms'])
+        print('    ' + '  '.join(f"{stage} {values['share']:.0%}" for stage, values in stages))
+    for name, failures in results['errors'].items():
+        print(f'{name}: {len(failures)} errors, e.g. {failures[0]}')
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='results JSON of another commit')
+    parser.add_argument('--limit', type=int, help='only the first N areas of each dataset')
+    parser.add_argument('--cached', action='store_true', help='keep the figure cache on')
+    parser.add_argument('--memory', action='store_true', help='trace allocations (slower) for peak memory')
+    args=parser.parse_args()
+
+    results=run(args.limit, args.cached, args.memory)
+    base=None
+    if args.compare:
+        with open(args.compare) as f:
+            base=json.load(f)
+    report(results, base)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
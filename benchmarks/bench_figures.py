@@ -0,0 +1,81 @@
+"""Time figure construction: the graph_objects engine against the old plotly.express build.
+
+    python benchmarks/bench_figures.py [--areas 50] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import datasets
+from helper_functions import trend_graph
+
+
+# The per-request work trend_graph did before the figure engine
+def px_trend_graph(df, yvarname, title):
+    df=df.copy()
+    df['Size']=1
+    df=df.groupby(['Area', pd.Grouper(key='Date', freq='y')]).mean(numeric_only=True).round(1)
+    df.reset_index(inplace=True)
+    graph=px.scatter(
+        data_frame=df, x='Year', y=yvarname, color='Area', symbol=df['Area'],
+        size=df['Size'], size_max=7, symbol_sequence=['circle', 'triangle-up', 'square'],
+        width=1200, height=600, hover_data={'Area':True, yvarname:True, 'Size':False}
+    ).update_traces(mode="lines+markers", line=dict(width=3))
+    fig=go.Figure(data=graph)
+    fig.update_layout(
+        font_family="Arial", title=title, showlegend=False,
+        xaxis=dict(tickmode='array', tickvals=list(range(2000, 2022)), tickangle=270, showgrid=False),
+        yaxis=dict(tick0=0, showgrid=False)
+    )
+    fig.update_yaxes(range=[90, 130])
+    for x0, x1 in [(2001.3, 2001.9), (2008, 2009), (2020, 2020.4)]:
+        fig.add_shape(type="rect", x0=x0, x1=x1, y0=0, y1=120, fillcolor='grey', opacity=0.25)
+        fig.add_annotation(x=x0, y=120, text='Recession', showarrow=False)
+    for i in range(3):
+        fig.add_annotation(x=2021, y=100+i, text='label', showarrow=False, xanchor='left')
+    return fig
+
+
+def timed(func, repeat):
+    times=[]
+    for _ in range(repeat):
+        start=time.perf_counter()
+        to_json_plotly(func())
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--areas', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args=parser.parse_args()
+
+    cube=datasets.cube('pop')
+    growth=datasets.growth('pop')
+    msas=[area for area, type in zip(cube.areas, cube.types) if type=='MSA'][:args.areas]
+
+    engine=[]
+    reference=[]
+    for msa in msas:
+        state_name=datasets.areas('pop').primary_state[msa]
+        areas=['United States', state_name, msa]
+        df=growth.frame(areas, 'Population')
+        engine.append(timed(lambda: trend_graph(df.copy(), state_name, msa, 'Index', True, title='t'), args.repeat))
+        reference.append(timed(lambda: px_trend_graph(df, 'Index', 't'), args.repeat))
+
+    engine_ms=statistics.median(engine) * 1000
+    reference_ms=statistics.median(reference) * 1000
+    print(f'areas: {len(msas)}  (median of best-of-{args.repeat}, build + JSON serialization)')
+    print(f'plotly.express build: {reference_ms:8.2f} ms')
+    print(f'figure engine:        {engine_ms:8.2f} ms')
+    print(f'speedup:              {reference_ms/engine_ms:8.1f}x')
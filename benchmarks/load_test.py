@@ -0,0 +1,312 @@
+"""Replay Dash callback traffic against a local server and report throughput and latency.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 [--users 16] [--duration 30]
+    python benchmarks/load_test.py --gunicorn "-w 4 -k gthread --threads 4" [--users 32]
+
+Each simulated user opens a tab, then switches areas, variables, area types,
+the recession toggle and tabs at random. It posts the /_dash-update-component
+requests a browser would send for each change, built from the server's own
+/_dash-dependencies. Label sliders are applied in the browser and send no
+requests. With --gunicorn, a server is started on a free local port for the
+run.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# How often a user makes each change, when the current tab allows it
+ACTIONS={'area': 5, 'yvar': 3, 'recession': 2, 'type': 1, 'tab': 1}
+AREA_IDS=('msa_dropdown', 'area_dropdown')
+
+
+class Client:
+    """One keep-alive connection, as a browser tab would hold."""
+
+    def __init__(self, url, timeout=60):
+        parts=urllib.parse.urlsplit(url)
+        self.host=parts.hostname
+        self.port=parts.port or 80
+        self.timeout=timeout
+        self.conn=None
+
+    def request(self, method, path, body=None):
+        data=None if body is None else json.dumps(body).encode()
+        headers={'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn=http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=data, headers=headers)
+                response=self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn=None
+                # A kept-alive connection the server closed is retried once
+                if attempt:
+                    raise
+
+
+def _outputs(output):
+    if output.startswith('..'):
+        return [part.rsplit('.', 1) for part in output[2:-2].split('...')]
+    return [output.rsplit('.', 1)]
+
+
+class Dependencies:
+    """Server-side callbacks of the app, and the request body for each."""
+
+    def __init__(self, client):
+        status, data=client.request('GET', '/_dash-dependencies')
+        if status!=200:
+            raise RuntimeError(f'/_dash-dependencies returned {status}')
+        self.callbacks=[dep for dep in json.loads(data) if not dep.get('clientside_function')]
+        for dep in self.callbacks:
+            dep['label']=_outputs(dep['output'])[0][0]
+            dep['keys']=[(item['id'], item['property']) for item in dep['inputs']]
+            dep['targets']={id for id, _ in _outputs(dep['output'])}
+
+    # Dash only fires callbacks whose outputs are on the page
+    def triggered_by(self, key, present):
+        return [dep for dep in self.callbacks if key in dep['keys'] and dep['targets'] <= present]
+
+    # Callbacks Dash fires when a new layout appears with all their inputs
+    def initial(self, values, present):
+        return [
+            dep for dep in self.callbacks
+            if all(key in values for key in dep['keys']) and dep['targets'] <= present
+            and ('tabs', 'value') not in dep['keys']
+        ]
+
+    @staticmethod
+    def body(dep, values, changed):
+        outputs=[{'id': id, 'property': prop} for id, prop in _outputs(dep['output'])]
+        return {
+            'output': dep['output'],
+            'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+            'inputs': [{'id': id, 'property': prop, 'value': values.get((id, prop))} for id, prop in dep['keys']],
+            'changedPropIds': [f'{id}.{prop}' for id, prop in changed],
+            'state': [],
+        }
+
+
+# id -> props of every component with an id in a serialized layout
+def components(layout, found=None):
+    if found is None:
+        found={}
+    if isinstance(layout, list):
+        for child in layout:
+            components(child, found)
+    elif isinstance(layout, dict) and 'props' in layout:
+        props=layout['props']
+        if 'id' in props:
+            found[props['id']]=props
+        components(props.get('children'), found)
+    return found
+
+
+class User(threading.Thread):
+    def __init__(self, url, deps, tabs, seed, deadline, results):
+        super().__init__(daemon=True)
+        self.client=Client(url)
+        self.deps=deps
+        self.tabs=tabs
+        self.random=random.Random(seed)
+        self.deadline=deadline
+        self.results=results
+        self.values={}
+        self.options={}
+        self.present={'tabs', 'tabs-content'}
+
+    def fire(self, dep, changed):
+        start_time=time.perf_counter()
+        try:
+            status, data=self.client.request('POST', '/_dash-update-component', Dependencies.body(dep, self.values, changed))
+        except (http.client.HTTPException, OSError):
+            status, data=None, b''
+        self.results.record(dep['label'], time.perf_counter()-start_time, status)
+        if status==200:
+            return json.loads(data)['response']
+        return None
+
+    def change(self, key, value):
+        self.values[key]=value
+        responses=[self.fire(dep, [key]) for dep in self.deps.triggered_by(key, self.present)]
+        for response in responses:
+            if response and 'tabs-content' in response:
+                self.open(response['tabs-content']['children'])
+
+    # New tab content: reset values to its defaults and fire its initial callbacks
+    def open(self, layout):
+        found=components(layout)
+        self.values={key: value for key, value in self.values.items() if key[0]=='tabs'}
+        self.options={}
+        self.present={'tabs', 'tabs-content'} | set(found)
+        for id, props in found.items():
+            if 'value' in props:
+                self.values[(id, 'value')]=props['value']
+            if props.get('options'):
+                self.options[id]=[option['value'] for option in props['options']]
+        for dep in self.deps.initial(self.values, self.present):
+            self.fire(dep, [])
+
+    def run(self):
+        self.change(('tabs', 'value'), self.random.choice(self.tabs))
+        while time.monotonic()<self.deadline:
+            available={action: weight for action, weight in ACTIONS.items() if self.target_of(action)}
+            action=self.random.choices(list(available), weights=list(available.values()))[0]
+            target=self.target_of(action)
+            choices=self.tabs if target=='tabs' else self.options[target]
+            self.change((target, 'value'), self.random.choice(choices))
+
+    def target_of(self, action):
+        if action=='tab':
+            return 'tabs'
+        if action=='area':
+            return next((id for id in AREA_IDS if id in self.options), None)
+        target={'yvar': 'yvar_dropdown', 'recession': 'recession', 'type': 'type_dropdown'}[action]
+        return target if target in self.options else None
+
+
+class Results:
+    def __init__(self):
+        self.samples={}
+        self._lock=threading.Lock()
+        self.recording=True
+
+    def record(self, label, seconds, status):
+        if not self.recording:
+            return
+        with self._lock:
+            self.samples.setdefault(label, []).append((seconds, status))
+
+    def summary(self, duration):
+        summary={}
+        for label, samples in sorted(self.samples.items()):
+            ms=np.array([seconds for seconds, _ in samples]) * 1000
+            # PreventUpdate answers 204
+            errors=sum(1 for _, status in samples if status not in (200, 204))
+            summary[label]={
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': round(errors / len(samples), 4),
+                'rps': round(len(samples) / duration, 2),
+                'p50_ms': round(float(np.percentile(ms, 50)), 2),
+                'p99_ms': round(float(np.percentile(ms, 99)), 2),
+                'max_ms': round(float(ms.max()), 2),
+            }
+        return summary
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(args, timeout=120):
+    port=_free_port()
+    command=[sys.executable, '-m', 'gunicorn', 'app:server', '-b', f'127.0.0.1:{port}'] + shlex.split(args)
+    server=subprocess.Popen(command, cwd=ROOT)
+    url=f'http://127.0.0.1:{port}'
+    deadline=time.monotonic()+timeout
+    while time.monotonic()<deadline:
+        try:
+            if Client(url, timeout=5).request('GET', '/startup')[0]==200:
+                return server, url
+        except OSError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {server.returncode}')
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def run(url, users, duration, warmup, seed):
+    client=Client(url)
+    deps=Dependencies(client)
+    status, data=client.request('GET', '/_dash-layout')
+    if status!=200:
+        raise RuntimeError(f'/_dash-layout returned {status}')
+    tab_values=[child['props']['value'] for child in components(json.loads(data))['tabs']['children']]
+
+    results=Results()
+    results.recording=warmup<=0
+    start=time.monotonic()
+    threads=[
+        User(url, deps, tab_values, seed+i, start+warmup+duration, results)
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    if warmup>0:
+        time.sleep(warmup)
+        results.recording=True
+    measure_start=time.monotonic()
+    for thread in threads:
+        thread.join()
+    measured=time.monotonic()-measure_start
+    return {
+        'url': url,
+        'users': users,
+        'duration_s': round(measured, 2),
+        'warmup_s': warmup,
+        'seed': seed,
+        'callbacks': results.summary(measured),
+        'total': {
+            'requests': sum(len(samples) for samples in results.samples.values()),
+            'rps': round(sum(len(samples) for samples in results.samples.values()) / measured, 2),
+        },
+    }
+
+
+def report(results):
+    print(f"{results['users']} users for {results['duration_s']} s against {results['url']}: "
+          f"{results['total']['requests']} requests, {results['total']['rps']} req/s")
+    print(f"{'callback':<24}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>9}")
+    for label, stats in results['callbacks'].items():
+        print(f"{label:<24}{stats['requests']:>9}{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}{stats['error_rate']:>9.2%}")
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--gunicorn', metavar='ARGS', help='start "gunicorn app:server ARGS" locally and test it')
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='seconds measured')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds run before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args=parser.parse_args()
+
+    server=None
+    url=args.url
+    if args.gunicorn is not None:
+        server, url=start_gunicorn(args.gunicorn)
+    try:
+        results=run(url, args.users, args.duration, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if args.gunicorn is not None:
+        results['gunicorn']=args.gunicorn
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
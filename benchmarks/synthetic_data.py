@@ -0,0 +1,249 @@
+"""Generate pop/lau/bea/qcew-shaped CSVs at a multiple of the real data's size.
+
+    python benchmarks/synthetic_data.py --scale 10 [--areas County=3000] [--first-year 1990]
+                                        [--last-year 2040] [--output-dir DIR] [--snapshot-dir DIR]
+
+Every dataset keeps the real columns, the United States, the 50 states
+plus DC, and New York-Newark-Jersey City, the tabs' default area. The
+number of other local areas of each type is the real one times --scale,
+or set with --areas TYPE=N (MSA, NECTA, County). Local areas are named like 'Ashford-Pinewood, OH-PA', 'Stoneport, MA-NH NECTA' and
+'Maple County, AL' so that areas.parse_states maps them to their states.
+With --snapshot-dir, a snapshot is built from the files; point
+ECONAPP_SNAPSHOT_DIR at it to run the app or the benchmarks on it.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from areas import us_state_to_abbrev
+from snapshot import build_snapshot
+
+# The 50 states and DC, without the territories
+STATES=list(us_state_to_abbrev)[:51]
+NEW_ENGLAND=['CT', 'MA', 'ME', 'NH', 'RI', 'VT']
+
+# Default area of the tab dropdowns, kept in every dataset
+DEFAULT_AREA='New York-Newark-Jersey City, NY-NJ-PA'
+
+# Local areas of each type in the real data
+BASE_AREAS={
+    'pop': {'MSA': 927},
+    'lau': {'MSA': 301, 'NECTA': 3},
+    'bea': {'MSA': 384},
+    'qcew': {'MSA': 80},
+}
+# First and last year of each real dataset
+YEARS={'pop': (2000, 2021), 'lau': (1990, 2021), 'bea': (1998, 2020), 'qcew': (2001, 2021)}
+LOCAL_TYPES=('MSA', 'NECTA', 'County')
+
+PREFIXES=[
+    'Ash', 'Bay', 'Bear', 'Bell', 'Birch', 'Black', 'Blue', 'Bridge', 'Brook', 'Cedar',
+    'Clear', 'Cold', 'Deer', 'Eagle', 'East', 'Elm', 'Fair', 'Fox', 'Glen', 'Green',
+    'Hazel', 'High', 'Lake', 'Lin', 'Maple', 'Mill', 'Oak', 'Pine', 'Red', 'River',
+    'Rock', 'Rose', 'Salt', 'Silver', 'Spring', 'Stone', 'Sun', 'West', 'White', 'Wolf',
+]
+SUFFIXES=[
+    'brook', 'burg', 'bury', 'crest', 'dale', 'field', 'ford', 'gate', 'ham', 'haven',
+    'land', 'ley', 'mont', 'port', 'ridge', 'ton', 'view', 'ville', 'wood', 'worth',
+]
+
+
+def _city(rng):
+    return rng.choice(PREFIXES) + rng.choice(SUFFIXES)
+
+
+def _name(type, rng):
+    if type=='County':
+        return f"{_city(rng)} County, {us_state_to_abbrev[rng.choice(STATES)]}"
+    if type=='NECTA':
+        codes=rng.choice(NEW_ENGLAND, size=rng.choice([1, 2], p=[0.7, 0.3]), replace=False)
+    else:
+        codes=[us_state_to_abbrev[state] for state in rng.choice(
+            STATES, size=rng.choice([1, 2, 3], p=[0.85, 0.12, 0.03]), replace=False
+        )]
+    cities='-'.join(_city(rng) for _ in range(rng.choice([1, 2, 3], p=[0.6, 0.3, 0.1])))
+    name=f"{cities}, {'-'.join(codes)}"
+    return name + ' NECTA' if type=='NECTA' else name
+
+
+def area_names(counts, rng):
+    """``counts[type]`` unique area names of each local type."""
+    names={}
+    seen={DEFAULT_AREA}
+    for type, count in counts.items():
+        names[type]=[]
+        while len(names[type])<count:
+            name=_name(type, rng)
+            if name not in seen:
+                seen.add(name)
+                names[type].append(name)
+    return names
+
+
+# Area and Type of every area of a dataset: the nation, the states, the
+# default MSA, then the local areas
+def _areas(pool, counts):
+    areas=[('United States', 'Nation')] + [(state, 'State') for state in STATES] + [(DEFAULT_AREA, 'MSA')]
+    for type in LOCAL_TYPES:
+        areas+=[(name, type) for name in pool.get(type, [])[:counts.get(type, 0)]]
+    return pd.DataFrame(areas, columns=['Area', 'Type'])
+
+
+# Log levels (areas x periods) as a random walk around a lognormal start
+def _levels(rng, types, periods, scales, drift, volatility):
+    start=np.array([np.log(scales[type]) for type in types]) + rng.normal(0, 1, len(types)) * (types!='Nation')
+    trend=rng.normal(drift, abs(drift) / 2 + 1e-9, (len(types), 1))
+    steps=trend + rng.normal(0, volatility, (len(types), periods))
+    return start[:, None] + np.cumsum(steps, axis=1)
+
+
+# Repeat each area over the periods, as the rows of a long panel
+def _panel(areas, periods):
+    df=areas.loc[areas.index.repeat(len(periods))].reset_index(drop=True)
+    return df, np.tile(periods, len(areas))
+
+
+def make_pop(areas, years, rng):
+    types=areas['Type'].values
+    levels=_levels(rng, types, len(years), {'Nation': 2.8e8, 'State': 4e6, 'MSA': 2e5, 'NECTA': 3e5, 'County': 5e4}, 0.008, 0.004)
+    df, year=_panel(areas, years)
+    return pd.DataFrame({
+        'Year': year,
+        'Population': np.exp(levels).round().astype(np.int64).ravel(),
+        'Area': df['Area'],
+        'Type': df['Type'],
+    })
+
+
+def make_lau(areas, years, rng):
+    months=pd.date_range(f'{years[0]}-01-01', f'{years[-1]}-12-01', freq='MS')
+    types=areas['Type'].values
+    levels=_levels(rng, types, len(months), {'Nation': 1.5e5, 'State': 2e3, 'MSA': 100, 'NECTA': 150, 'County': 25}, 0.0008, 0.002)
+
+    # A common cycle with recessions, shifted and scaled per area
+    t=np.arange(len(months))
+    cycle=5 + 1.5 * np.sin(2 * np.pi * t / 120)
+    for start, peak, length in (('2001-03', 1.5, 24), ('2008-01', 4.5, 60), ('2020-03', 9, 18)):
+        since=(months - pd.Timestamp(start)).days.values / 30.4
+        cycle+=np.where((since>=0) & (since<length), peak * np.exp(-np.maximum(since-3, 0) / (length / 3)), 0)
+    rate=(cycle * rng.lognormal(0, 0.25, (len(types), 1)) + rng.normal(0, 0.2, (len(types), len(months)))).clip(1, 30).round(1)
+    labor_force=np.exp(levels).round(1)
+
+    df, date=_panel(areas, months.strftime('%Y-%m-%d').values)
+    return pd.DataFrame({
+        'Area': df['Area'],
+        'Type': df['Type'],
+        'Date': date,
+        'Year': np.tile(months.year.values, len(areas)),
+        'Employment': (labor_force * (1 - rate / 100)).round(1).ravel(),
+        'Labor Force': labor_force.ravel(),
+        'Unemployment Rate': rate.ravel(),
+    })
+
+
+def make_bea(areas, years, rng):
+    types=areas['Type'].values
+    gdp=np.exp(_levels(rng, types, len(years), {'Nation': 1.2e7, 'State': 2e5, 'MSA': 1e4, 'NECTA': 2e4, 'County': 3e3}, 0.02, 0.02))
+    income=np.exp(_levels(rng, types, len(years), {'Nation': 3e4, 'State': 3e4, 'MSA': 3e4, 'NECTA': 3.5e4, 'County': 2.8e4}, 0.035, 0.015))
+    # One price index for every area, 100 in 2012
+    pcepi=100 * 1.019 ** (np.asarray(years) - 2012) * np.exp(rng.normal(0, 0.004, len(years)))
+    base=np.searchsorted(years, 2012) if years[0]<=2012<=years[-1] else 0
+    real_gdp=gdp / (pcepi / 100)
+
+    df, year=_panel(areas, years)
+    return pd.DataFrame({
+        'Area': df['Area'],
+        'Year': year,
+        'Real GDP (Millions)': real_gdp.round(0).ravel(),
+        'Real GDP Quality Index': (real_gdp / real_gdp[:, [base]] * 100).round(3).ravel(),
+        'Current-Dollar GDP (Millions)': gdp.round(0).ravel(),
+        'Per Capita Personal Income': income.round(0).ravel(),
+        'PCEPI': np.tile(pcepi, len(areas)),
+        'PCEPI2012': 100.0,
+        'Real Per Capita Personal Income': (income.round(0) / pcepi * 100).ravel(),
+        'Type': df['Type'],
+    })
+
+
+def make_qcew(areas, years, rng):
+    quarters=len(years) * 4
+    types=areas['Type'].values
+    levels=_levels(rng, types, quarters, {'Nation': 9e6, 'State': 1.5e5, 'MSA': 8e3, 'NECTA': 1.2e4, 'County': 2e3}, 0.004, 0.006)
+
+    df, year=_panel(areas, np.repeat(years, 4))
+    quarter=np.tile([1, 2, 3, 4], len(areas) * len(years))
+    return pd.DataFrame({
+        'Area': df['Area'],
+        'Type': df['Type'],
+        'Year': year,
+        'Quarter': np.char.add('Q', quarter.astype(str)),
+        'Establishment Count': np.exp(levels).round(0).ravel(),
+        'Date': [f'{y}-{3 * q:02d}-01' for y, q in zip(year, quarter)],
+    })
+
+
+MAKERS={'pop': make_pop, 'lau': make_lau, 'bea': make_bea, 'qcew': make_qcew}
+
+
+def generate(scale=10, areas=None, first_year=None, last_year=None, seed=0):
+    """Synthetic frames ``{name: df}`` shaped like the real datasets.
+
+    ``areas`` maps a local type to its number of areas in every dataset and
+    overrides ``scale`` for that type.
+    """
+    rng=np.random.default_rng(seed)
+    counts={
+        name: {type: int(round(count * scale)) for type, count in base.items()}
+        for name, base in BASE_AREAS.items()
+    }
+    for name in counts:
+        counts[name].update(areas or {})
+    pool=area_names(
+        {type: max(c.get(type, 0) for c in counts.values()) for type in LOCAL_TYPES},
+        rng
+    )
+    frames={}
+    for name, make in MAKERS.items():
+        start, end=YEARS[name]
+        years=np.arange(first_year or start, (last_year or end) + 1)
+        frames[name]=make(_areas(pool, counts[name]), years, rng)
+    return frames
+
+
+def _count(value):
+    type, _, count=value.partition('=')
+    if type not in LOCAL_TYPES or not count.isdigit():
+        raise argparse.ArgumentTypeError(f'expected TYPE=N with TYPE one of {", ".join(LOCAL_TYPES)}')
+    return type, int(count)
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=10, help='local areas as a multiple of the real data')
+    parser.add_argument('--areas', type=_count, action='append', default=[], metavar='TYPE=N',
+                        help='number of local areas of a type in every dataset')
+    parser.add_argument('--first-year', type=int, help='first year of every dataset')
+    parser.add_argument('--last-year', type=int, help='last year of every dataset')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', help='where to write <name>.csv (default data/synthetic/x<scale>)')
+    parser.add_argument('--snapshot-dir', help='also build a snapshot from the files here')
+    args=parser.parse_args()
+
+    output_dir=args.output_dir or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'synthetic', f'x{args.scale:g}'
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    frames=generate(args.scale, dict(args.areas), args.first_year, args.last_year, args.seed)
+    sources={}
+    for name, df in frames.items():
+        sources[name]=os.path.join(output_dir, f'{name}.csv')
+        df.to_csv(sources[name], index=False)
+        print(f"{name}: {len(df)} rows, {df['Area'].nunique()} areas ({', '.join(f'{type} {n}' for type, n in df.drop_duplicates('Area')['Type'].value_counts().items())})")
+    print(output_dir)
+    if args.snapshot_dir:
+        print(build_snapshot(sources, args.snapshot_dir))
@@ -0,0 +1,229 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+from metrics import stage
+
+
+# Set while a request must run its callbacks uncached (e.g. when profiled)
+_bypass=contextvars.ContextVar('figure_cache_bypass', default=False)
+
+
+@contextlib.contextmanager
+def bypass():
+    token=_bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class FigureCache:
+    """Process-wide LRU of serialized callback outputs, bounded by total size."""
+
+    def __init__(self, max_bytes=64 * 2**20, shared=None):
+        self.max_bytes=max_bytes
+        self.shared=shared
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self.bytes=0
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            payload=self._entries.get(key)
+            if payload is None:
+                self.misses+=1
+                return None
+            self._entries.move_to_end(key)
+            self.hits+=1
+            return payload
+
+    def put(self, key, payload):
+        size=len(payload)
+        if size>self.max_bytes:
+            return
+        with self._lock:
+            old=self._entries.pop(key, None)
+            if old is not None:
+                self.bytes-=len(old)
+            self._entries[key]=payload
+            self.bytes+=size
+            while self.bytes>self.max_bytes:
+                _, evicted=self._entries.popitem(last=False)
+                self.bytes-=len(evicted)
+                self.evictions+=1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes=0
+
+    # Drop the entries memoized under one dataset version
+    def invalidate(self, version):
+        with self._lock:
+            for key in [key for key in self._entries if key[1]==version]:
+                self.bytes-=len(self._entries.pop(key))
+
+    def stats(self):
+        with self._lock:
+            stats={
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+        if self.shared is not None:
+            stats['shared']=self.shared.stats()
+        return stats
+
+    # Cache a callback on (name, dataset version, inputs)
+    def memoize(self, version):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                if _bypass.get():
+                    output=func(*args)
+                    with stage('serialize'):
+                        payload=to_json_plotly(output)
+                    return json.loads(payload)
+                key=(func.__name__, version(), args)
+                with stage('cache'):
+                    payload=self.get(key)
+                    if payload is None and self.shared is not None:
+                        payload=self.shared.get(key)
+                        if payload is not None:
+                            self.put(key, payload)
+                if payload is None:
+                    output=func(*args)
+                    with stage('serialize'):
+                        payload=to_json_plotly(output)
+                    with stage('store'):
+                        self.put(key, payload)
+                        if self.shared is not None:
+                            self.shared.put(key, payload)
+                with stage('decode'):
+                    return json.loads(payload)
+            return wrapper
+        return decorator
+
+
+class SQLiteCache:
+    """Cache shared by every worker on the host, stored in one SQLite file.
+
+    Payloads are zlib compressed. Each write is its own transaction, entries
+    older than ``ttl`` seconds are ignored and purged, and the oldest entries
+    are evicted once the stored payloads exceed ``max_bytes``.
+    """
+
+    def __init__(self, path, max_bytes=256 * 2**20, ttl=24 * 3600):
+        self.path=path
+        self.max_bytes=max_bytes
+        self.ttl=ttl
+        self.hits=0
+        self.misses=0
+        self.errors=0
+        self._local=threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, payload BLOB NOT NULL, '
+                'size INTEGER NOT NULL, created REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_created ON entries (created)')
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        conn=getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid!=os.getpid():
+            conn=sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn=conn
+            self._local.pid=os.getpid()
+        return conn
+
+    def get(self, key):
+        try:
+            row=self._connect().execute(
+                'SELECT payload FROM entries WHERE key=? AND created>=?',
+                (json.dumps(key), time.time()-self.ttl)
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors+=1
+            return None
+        if row is None:
+            self.misses+=1
+            return None
+        self.hits+=1
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, key, payload):
+        blob=zlib.compress(payload.encode())
+        now=time.time()
+        try:
+            conn=self._connect()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, payload, size, created) VALUES (?, ?, ?, ?)',
+                    (json.dumps(key), blob, len(blob), now)
+                )
+                conn.execute('DELETE FROM entries WHERE created<?', (now-self.ttl,))
+                total=conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+                if total>self.max_bytes:
+                    # Drop the oldest entries until the rest fit
+                    conn.execute(
+                        'DELETE FROM entries WHERE key IN ('
+                        'SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY created DESC) AS running '
+                        'FROM entries) WHERE running>?)',
+                        (self.max_bytes,)
+                    )
+        except sqlite3.Error:
+            self.errors+=1
+
+    def stats(self):
+        try:
+            entries, size=self._connect().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size=None, None
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+        }
+
+
+# Set ECONAPP_SHARED_CACHE to a file path to share outputs between workers
+shared_cache=None
+if os.environ.get('ECONAPP_SHARED_CACHE'):
+    shared_cache=SQLiteCache(
+        os.environ['ECONAPP_SHARED_CACHE'],
+        max_bytes=int(float(os.environ.get('ECONAPP_SHARED_CACHE_MB', 256)) * 2**20),
+        ttl=float(os.environ.get('ECONAPP_SHARED_CACHE_TTL', 24 * 3600))
+    )
+
+figure_cache=FigureCache(
+    max_bytes=int(float(os.environ.get('ECONAPP_FIGURE_CACHE_MB', 64)) * 2**20),
+    shared=shared_cache
+)
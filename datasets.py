@@ -0,0 +1,329 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from areas import AreaIndex
+from helper_functions import get_balanced_panel
+from panel import AnnualPanel, GrowthTables, PanelCube
+from schema import compact, memory_usage
+from snapshot import (
+    SNAPSHOT_DIR, current_version, dataset_digest, ensure_snapshot, load_dataset, read_manifest
+)
+
+logger=logging.getLogger(__name__)
+
+# How each dataset is balanced once loaded
+DATASETS={
+    'pop': {'datevar': 'Year', 'format': '%Y'},
+    'lau': {'datevar': 'Date', 'format': '%Y-%m-%d'},
+    'bea': {'datevar': 'Year', 'format': '%Y'},
+    'qcew': {'datevar': 'Year', 'format': '%Y'},
+}
+
+# Set ECONAPP_SHARED_DATA=1 to map the panel matrices read-only from the
+# snapshot, so that gunicorn workers share one copy in the page cache
+SHARED_DATA=os.environ.get('ECONAPP_SHARED_DATA', '').lower() in ('1', 'true', 'yes')
+
+# Seconds between checks of the snapshot's CURRENT file; 0 disables polling
+RELOAD_INTERVAL=float(os.environ.get('ECONAPP_RELOAD_INTERVAL', 60))
+
+
+class DatasetRegistry:
+    """Loads and balances each dataset on first use and keeps it resident."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, shared=SHARED_DATA, version=None):
+        self.snapshot_dir=snapshot_dir
+        self.shared=shared
+        if version is None:
+            ensure_snapshot(snapshot_dir)
+        self.manifest=read_manifest(snapshot_dir, version)
+        self.version=self.manifest['version']
+        self.dataset_versions={
+            name: dataset_digest(entry) for name, entry in self.manifest['datasets'].items()
+        }
+        self.load_seconds={}
+        self.memory={}
+        self.coverage={}
+        self._resident={}
+        self._locks={}
+        self._locks_guard=threading.Lock()
+        # Registry this one replaced, and the periods changed since, per dataset
+        self._updates={}
+
+    def _once(self, key, build):
+        value=self._resident.get(key)
+        if value is not None:
+            return value
+        with self._locks_guard:
+            lock=self._locks.setdefault(key, threading.Lock())
+        # Only one thread builds a given entry; the others wait for it
+        with lock:
+            value=self._resident.get(key)
+            if value is None:
+                value=build()
+                self._resident[key]=value
+        return value
+
+    def _load(self, name):
+        start_time=time.perf_counter()
+        df=load_dataset(name, self.manifest, self.snapshot_dir, compact=True)
+        df, coverage=get_balanced_panel(df, **DATASETS[name])
+        df=compact(df)
+        self.load_seconds[name]=time.perf_counter()-start_time
+        self.coverage[name]=coverage
+        logger.info(
+            'Balanced %s from %s to %s: %d rows kept, %d dropped, %d areas with gaps',
+            name, coverage['start'], coverage['end'], coverage['rows'], coverage['rows_dropped'],
+            sum(1 for area in coverage['areas'].values() if area['gaps'])
+        )
+        self.memory[name]=memory_usage(df)
+        logger.info(
+            'Loaded %s from snapshot %s in %.1f ms, %.2f MB in memory (%s)',
+            name, self.version, self.load_seconds[name] * 1000,
+            sum(self.memory[name].values()) / 2**20,
+            ', '.join(
+                f'{col}: {df[col].dtype} {size / 2**10:.0f} kB'
+                for col, size in self.memory[name].items()
+            )
+        )
+        return df
+
+    def get(self, name):
+        if name not in DATASETS:
+            raise KeyError(name)
+        return self._once(('frame', name), lambda: self._load(name))
+
+    # Directory under <snapshot>/<version>/cubes/, written by the first worker that needs it
+    def _shared_dir(self, parts, write):
+        path=os.path.join(self.snapshot_dir, self.version, 'cubes', *parts)
+        if not os.path.isdir(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_dir=tempfile.mkdtemp(prefix=f'.{parts[-1]}-', dir=os.path.dirname(path))
+            try:
+                write(tmp_dir)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+            try:
+                os.rename(tmp_dir, path)
+            except OSError:
+                # Another worker got there first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                if not os.path.isdir(path):
+                    raise
+        return path
+
+    def _write_cube(self, name, path):
+        PanelCube(self._load(name)).save(path)
+        with open(os.path.join(path, 'coverage.json'), 'w') as f:
+            json.dump(self.coverage[name], f)
+
+    # Balanced cube saved next to the snapshot and mapped read-only
+    def _shared_cube(self, name):
+        start_time=time.perf_counter()
+        path=self._shared_dir([name], lambda tmp_dir: self._write_cube(name, tmp_dir))
+        cube=PanelCube.load(path, mmap_mode='r')
+        if name not in self.coverage and os.path.exists(os.path.join(path, 'coverage.json')):
+            with open(os.path.join(path, 'coverage.json')) as f:
+                self.coverage[name]=json.load(f)
+        self.load_seconds[name]=time.perf_counter()-start_time
+        logger.info(
+            'Mapped %s from snapshot %s in %.1f ms',
+            name, self.version, self.load_seconds[name] * 1000
+        )
+        return cube
+
+    # Tables derived from a cube: built in memory, or with shared=True saved
+    # inside the cube's directory and mapped read-only like it
+    def _tables(self, key, part, cls, build):
+        if not self.shared:
+            return build()
+        # The cube's directory has to exist first
+        cube=self.cube(key[1])
+        path=self._shared_dir([key[1], part], lambda tmp_dir: build().save(tmp_dir))
+        return cls.load(cube, path, mmap_mode='r')
+
+    def cube(self, name):
+        if name not in DATASETS:
+            raise KeyError(name)
+        if self.shared:
+            return self._once(('cube', name), lambda: self._shared_cube(name))
+        return self._once(('cube', name), lambda: PanelCube(self.get(name)))
+
+    def growth(self, name, start_year=None, end_year=None):
+        key=('growth', name, start_year, end_year)
+        part=f"growth-{start_year or 'first'}-{end_year or 'last'}"
+        return self._once(key, lambda: self._tables(
+            key, part, GrowthTables,
+            lambda: GrowthTables(self.cube(name), start_year, end_year, *self._previous(key))
+        ))
+
+    def annual(self, name):
+        key=('annual', name)
+        return self._once(key, lambda: self._tables(
+            key, 'annual', AnnualPanel, lambda: AnnualPanel(self.cube(name), *self._previous(key))
+        ))
+
+    def dataset_version(self, name):
+        return self.dataset_versions[name]
+
+    # Entry of the replaced registry for key, and the periods changed since
+    def _previous(self, key):
+        update=self._updates.get(key[1])
+        if update is None:
+            return None, None
+        old, changed=update
+        return old._resident.get(key), changed
+
+    def inherit(self, old):
+        """Take over the entries of ``old`` for datasets that did not change.
+
+        Datasets updated by ``ingest.py`` record the periods they changed, so
+        their derived tables are updated from those of ``old`` rather than
+        rebuilt, until ``release`` is called.
+        """
+        for name, version in self.dataset_versions.items():
+            if old.dataset_versions.get(name)==version:
+                for key, value in list(old._resident.items()):
+                    if key[1]==name:
+                        self._resident[key]=value
+                for stats in ('load_seconds', 'memory', 'coverage'):
+                    if name in getattr(old, stats):
+                        getattr(self, stats)[name]=getattr(old, stats)[name]
+                continue
+            changes=self.manifest['datasets'][name].get('changes')
+            if changes and changes['base']==old.dataset_versions.get(name) and name in DATASETS:
+                changed=pd.to_datetime(changes['periods'], format=DATASETS[name]['format'])
+                self._updates[name]=(old, changed)
+
+    def changed_since(self, old):
+        return sorted(
+            name for name, version in self.dataset_versions.items()
+            if old.dataset_versions.get(name)!=version
+        )
+
+    def release(self):
+        self._updates.clear()
+
+    def areas(self, name):
+        return self._once(('areas', name), lambda: AreaIndex(self.cube(name)))
+
+    def loaded(self):
+        return sorted({key[1] for key in self._resident if key[0] in ('frame', 'cube')})
+
+    def resident_keys(self):
+        return list(self._resident)
+
+    # Build the given entries (as listed by resident_keys) ahead of use
+    def warm(self, keys):
+        builders={
+            'frame': self.get,
+            'cube': self.cube,
+            'growth': self.growth,
+            'annual': self.annual,
+            'areas': self.areas,
+        }
+        for kind, *args in keys:
+            builders[kind](*args)
+
+
+class DatasetManager:
+    """Serves one DatasetRegistry at a time and swaps in new snapshot versions.
+
+    When the snapshot's CURRENT file names a new version (polled every
+    ``interval`` seconds, or on ``reload()``), a registry for it is built and
+    warmed with everything the active one had loaded, then swapped in with a
+    single assignment. Functions wrapped with ``pinned`` see one version from
+    start to end; other attributes are those of the active registry.
+    """
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, shared=SHARED_DATA, interval=RELOAD_INTERVAL):
+        self.snapshot_dir=snapshot_dir
+        self.shared=shared
+        self.interval=interval
+        self.registry=DatasetRegistry(snapshot_dir, shared=shared)
+        self.reloads=0
+        self._on_swap=[]
+        self._pinned=contextvars.ContextVar('pinned_registry', default=None)
+        self._reload_lock=threading.Lock()
+        self._watch_lock=threading.Lock()
+        self._watcher_pid=None
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.active(), attr)
+
+    def active(self):
+        self._watch()
+        return self._pinned.get() or self.registry
+
+    @contextlib.contextmanager
+    def pin(self):
+        token=self._pinned.set(self.active())
+        try:
+            yield self._pinned.get()
+        finally:
+            self._pinned.reset(token)
+
+    def pinned(self, func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            with self.pin():
+                return func(*args)
+        return wrapper
+
+    # Called with the old and new registries after each swap
+    def on_swap(self, callback):
+        self._on_swap.append(callback)
+        return callback
+
+    def reload(self):
+        """Swap in the version named by CURRENT if it is new; returns the active version."""
+        with self._reload_lock:
+            old=self.registry
+            version=current_version(self.snapshot_dir)
+            if version is None or version==old.version:
+                return old.version
+            start_time=time.perf_counter()
+            new=DatasetRegistry(self.snapshot_dir, shared=self.shared, version=version)
+            new.inherit(old)
+            new.warm(old.resident_keys())
+            new.release()
+            self.registry=new
+            self.reloads+=1
+            logger.info(
+                'Swapped data snapshot %s for %s after %.1f ms; changed: %s',
+                old.version, new.version, (time.perf_counter()-start_time) * 1000,
+                ', '.join(new.changed_since(old)) or 'none'
+            )
+            for callback in self._on_swap:
+                callback(old, new)
+            return new.version
+
+    # One polling thread per process, started on first use (after any fork)
+    def _watch(self):
+        if self.interval<=0 or self._watcher_pid==os.getpid():
+            return
+        with self._watch_lock:
+            if self._watcher_pid==os.getpid():
+                return
+            self._watcher_pid=os.getpid()
+            threading.Thread(target=self._poll, name='dataset-reload', daemon=True).start()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception:
+                logger.exception('Could not load data snapshot %s', current_version(self.snapshot_dir))
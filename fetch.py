@@ -0,0 +1,161 @@
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import pandas as pd
+from tenacity import before_sleep_log, retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+logger=logging.getLogger(__name__)
+
+DATA_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Last good copy of each download, with its ETag and Last-Modified
+FETCH_DIR=os.environ.get('ECONAPP_FETCH_DIR', os.path.join(DATA_DIR, 'raw'))
+FETCH_TIMEOUT=float(os.environ.get('ECONAPP_FETCH_TIMEOUT', 60))
+FETCH_ATTEMPTS=int(os.environ.get('ECONAPP_FETCH_ATTEMPTS', 3))
+
+
+class FetchError(Exception):
+    pass
+
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+
+# Connection problems, timeouts and server errors are worth another try
+def _retryable(error):
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code>=500 or error.code==429
+    return isinstance(error, (urllib.error.URLError, OSError))
+
+
+# Socket under an http.client response, or None. http.client has no public
+# accessor, so any change in its internals only loses the tighter timeout
+def _socket(response):
+    try:
+        sock=response.fp.raw._sock
+    except AttributeError:
+        return None
+    return sock if callable(getattr(sock, 'settimeout', None)) else None
+
+
+# Read what has arrived, waiting no longer than the time left before deadline.
+# Without the socket, each read is bounded by urlopen's timeout instead, so a
+# download stops at most one timeout past its deadline
+def _read_chunk(response, deadline, url, timeout):
+    remaining=deadline-time.monotonic()
+    if remaining<=0:
+        raise TimeoutError(f'{url} took more than {timeout:g}s')
+    sock=_socket(response)
+    if sock is not None:
+        sock.settimeout(remaining)
+    try:
+        return response.read1(1 << 16)
+    except TimeoutError:
+        raise TimeoutError(f'{url} took more than {timeout:g}s') from None
+
+
+def _download(url, headers, dest_dir, timeout):
+    deadline=time.monotonic()+timeout
+    request=urllib.request.Request(url, headers=headers)
+    try:
+        response=urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as error:
+        if error.code==304:
+            return None, None
+        raise
+    with response:
+        fd, tmp=tempfile.mkstemp(prefix='.fetch-', dir=dest_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: _read_chunk(response, deadline, url, timeout), b''):
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return response.headers, tmp
+
+
+def fetch(name, url, fetch_dir=FETCH_DIR, timeout=FETCH_TIMEOUT, attempts=FETCH_ATTEMPTS, fallback=None):
+    """Download ``url`` to ``<fetch_dir>/<name>.csv`` and return ``(path, status)``.
+
+    The request is conditional on the ETag and Last-Modified of the last good
+    copy, retried with exponential backoff, and bounded by ``timeout`` seconds
+    per attempt. If every attempt fails, the last good copy (or ``fallback``)
+    is used. Status is 'downloaded', 'not-modified' or 'fallback'.
+    """
+    os.makedirs(fetch_dir, exist_ok=True)
+    path=os.path.join(fetch_dir, f'{name}.csv')
+    meta_path=os.path.join(fetch_dir, f'{name}.json')
+    meta={}
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta=json.load(f)
+    headers={}
+    if meta.get('url')==url:
+        if meta.get('etag'):
+            headers['If-None-Match']=meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since']=meta['last_modified']
+
+    download=retry(
+        stop=stop_after_attempt(attempts),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        retry=retry_if_exception(_retryable),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
+    )(_download)
+    try:
+        response_headers, tmp=download(url, headers, fetch_dir, timeout)
+    except Exception as error:
+        for copy in (path, fallback):
+            if copy and os.path.exists(copy):
+                logger.warning('Could not fetch %s (%s); using %s', url, error, copy)
+                return copy, 'fallback'
+        raise FetchError(f'Could not fetch {url} and no local copy exists') from error
+
+    if tmp is None:
+        return path, 'not-modified'
+    os.replace(tmp, path)
+    with open(meta_path, 'w') as f:
+        json.dump({
+            'url': url,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'fetched': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        }, f, indent=2)
+    return path, 'downloaded'
+
+
+def _read(name, source, fetch_dir, timeout, attempts):
+    start_time=time.perf_counter()
+    status='local'
+    path=source
+    if is_url(source):
+        path, status=fetch(
+            name, source, fetch_dir, timeout, attempts,
+            fallback=os.path.join(DATA_DIR, f'{name}.csv')
+        )
+    df=pd.read_csv(path)
+    logger.info('Read %s (%s) in %.1f ms', name, status, (time.perf_counter()-start_time) * 1000)
+    return df, status
+
+
+def read_sources(sources, fetch_dir=FETCH_DIR, timeout=FETCH_TIMEOUT, attempts=FETCH_ATTEMPTS):
+    """Fetch and parse every source at once; returns ``{name: (frame, status)}``.
+
+    Sources are URLs or local paths. Wall time is that of the slowest source.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(sources), 1)) as pool:
+        futures={
+            name: pool.submit(_read, name, source, fetch_dir, timeout, attempts)
+            for name, source in sources.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
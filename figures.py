@@ -0,0 +1,309 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+NATION_COLOR="#1b9e77"
+STATE_COLOR="#7570b3"
+MSA_COLOR='#d95f02'
+
+# Per-chart differences between the annual graphs
+ANNUAL_STYLES={
+    'trend': {'label_xshift': 15, 'label_xmin': 2021, 'top_pad': 1},
+    'bea': {'label_xshift': 25, 'label_xmin': 2020, 'top_pad': 5},
+}
+ANNUAL_SYMBOLS=['circle', 'triangle-up', 'square']
+MONTH_SYMBOLS=['square', 'circle', 'triangle-up']
+
+# Label spacing: 18px text plus line spacing, over the plot area of a 600px figure
+LABEL_LINE_PX=22
+PLOT_HEIGHT_PX=600-60-80
+
+_templates={}
+
+
+# Layout shared by every figure of a kind, validated once by graph_objects
+def _template(kind):
+    layout=_templates.get(kind)
+    if layout is None:
+        xaxis=dict(tickfont=dict(size=18, color='black'), showgrid=False)
+        if kind=='annual':
+            xaxis.update(tickmode='array', tickangle=270)
+        fig=go.Figure(layout=dict(
+            width=1200,
+            height=600,
+            margin=dict(t=60),
+            font=dict(family="Arial", size=18, color="black"),
+            showlegend=False,
+            xaxis=xaxis,
+            yaxis=dict(tick0=0, tickfont=dict(size=18, color='black'), showgrid=False)
+        ))
+        layout=fig.to_dict()['layout']
+        _templates[kind]=layout
+    return layout
+
+
+def _layout(kind, title, xaxis_title, yaxis_title, yrange, shapes, annotations, **xaxis):
+    base=_template(kind)
+    layout=dict(base)
+    layout['title']={'text': title}
+    layout['xaxis']=dict(base['xaxis'], title={'text': xaxis_title}, **xaxis)
+    layout['yaxis']=dict(base['yaxis'], title={'text': yaxis_title}, range=yrange)
+    if shapes:
+        layout['shapes']=shapes
+    layout['annotations']=annotations
+    return layout
+
+
+def _trace(name, x, y, color, symbol, xname, yname):
+    return {
+        'type': 'scatter',
+        'mode': 'lines+markers',
+        'name': name,
+        'legendgroup': name,
+        'x': x,
+        'y': y,
+        'line': {'width': 3},
+        'marker': {'color': color, 'symbol': symbol, 'size': 7},
+        'hovertemplate': f'Area={name}<br>{xname}=%{{x}}<br>{yname}=%{{y}}<extra></extra>',
+    }
+
+
+def _recession(x0, x1, yheight, text, x, yshift=20, ypad=0.25):
+    shape={
+        'type': 'rect', 'x0': x0, 'x1': x1, 'y0': 0, 'y1': yheight,
+        'fillcolor': 'grey', 'opacity': 0.25, 'line': {'color': 'grey'}
+    }
+    annotation={
+        'x': x, 'y': yheight+ypad, 'xshift': 20, 'yshift': yshift,
+        'text': text, 'showarrow': False, 'font': {'size': 18}
+    }
+    return shape, annotation
+
+
+def _label(x, y, text, color, name, xshift):
+    return {
+        'x': x, 'y': y, 'text': text, 'name': name,
+        'font': {'color': color, 'size': 18},
+        'align': 'left', 'xanchor': 'left', 'showarrow': False, 'xshift': xshift
+    }
+
+
+def label_gap(yrange, lines=1):
+    """Smallest centre-to-centre distance, in data units, between labels of ``lines`` lines."""
+    return lines * LABEL_LINE_PX * (yrange[1]-yrange[0]) / PLOT_HEIGHT_PX
+
+
+def resolve_labels(y, gap, lo=-np.inf, hi=np.inf):
+    """Move labels at least ``gap`` apart, displacing them as little as possible.
+
+    Returns the new positions in the order of ``y``. Shifting the sorted
+    values by ``i * gap`` turns the spacing constraint into a monotonicity
+    one, solved by pool-adjacent-violators isotonic regression; the stack is
+    then clipped into ``[lo, hi]`` when it fits. O(n log n) for n labels.
+    """
+    y=np.asarray(y, dtype=float)
+    n=len(y)
+    if n<2:
+        return y.copy()
+    order=np.argsort(y, kind='stable')
+    steps=gap * np.arange(n)
+    z=y[order]-steps
+
+    means=[]
+    weights=[]
+    for value in z:
+        means.append(value)
+        weights.append(1)
+        while len(means)>1 and means[-2]>means[-1]:
+            weight=weights[-2]+weights[-1]
+            means[-2:]=[(means[-2]*weights[-2]+means[-1]*weights[-1])/weight]
+            weights[-2:]=[weight]
+    w=np.repeat(means, weights)
+
+    if hi-lo>=steps[-1]:
+        w=np.clip(w, lo, hi-steps[-1])
+    positions=np.empty(n)
+    positions[order]=w+steps
+    return positions
+
+
+# Label positions for one anchor date, keyed like ``values``
+def _place(values, yrange, lines):
+    gap=label_gap(yrange, lines)
+    y=resolve_labels(list(values.values()), gap, yrange[0]+gap/2, yrange[1]-gap/2)
+    return dict(zip(values, y))
+
+
+def _areas(df, state_name, msa):
+    msa_name=msa.split(',')[0].split('-')[0].strip()
+    type = df.loc[df.Area==msa,'Type'].values[0]
+    msa_name=f'{msa_name} {type}'
+    colors={
+        "United States": NATION_COLOR,
+        state_name: STATE_COLOR,
+        msa_name: MSA_COLOR
+    }
+    names={
+        'United States': 'nation',
+        state_name: 'state',
+        msa_name: 'msa'
+    }
+    return msa_name, colors, names
+
+
+# Manual label offsets, given as {label name: (up, slider)}
+def _offsets(names, adjustments):
+    offsets={}
+    for area, name in names.items():
+        up, slider=adjustments.get(name, (True, 0))
+        offsets[area]=slider if up else -slider
+    return offsets
+
+
+# Annual line chart (Population, Labor Market annual, GDP / Income); df has one row per area and year
+def annual_figure(
+    df, state_name, msa, yvarname, recession, style='trend',
+    title=None, yaxis_title=None, xaxis_title=None, adjustments=None):
+
+    spec=ANNUAL_STYLES[style]
+    msa_name, colors, names=_areas(df, state_name, msa)
+
+    values=df[yvarname].values
+    if style=='bea' and yvarname=="Real Per Capita Personal Income":
+        values=values/10**3
+    cagr=df['CAGR'].values if 'CAGR' in df else np.full(len(df), np.nan)
+    area=np.where(df['Area'].values==msa, msa_name, df['Area'].values)
+    years=df['Year'].values
+
+    # One row per area and calendar year, areas in sorted order
+    series={}
+    for name in sorted(set(area)):
+        rows=area==name
+        # +0.0 before rounding turns an exact -0.0 into 0.0, as the sum in the old
+        # groupby mean did; small negatives still round to -0.0 as they did there
+        series[name]=(years[rows], (values[rows]+0.0).round(1), (cagr[rows]+0.0).round(1))
+
+    traces=[
+        _trace(name, years, y, colors[name], ANNUAL_SYMBOLS[i], 'Year', yvarname)
+        for i, (name, (years, y, _)) in enumerate(series.items())
+    ]
+
+    xmin=int(min(s[0].min() for s in series.values()))
+    xmax=int(max(s[0].max() for s in series.values()))
+    if xmax<2021:
+        xmax=2021
+    ymin=min(s[1].min() for s in series.values())
+    ymax=max(s[1].max() for s in series.values())
+    yheight=ymax+(ymax-ymin)/12
+    if style=='bea' and yvarname=="Real Per Capita Personal Income":
+        yheight=yheight+5
+    if yvarname=="Index":
+        yrange=[min(ymin-10,90), yheight+5]
+    else:
+        yrange=[0, yheight+spec['top_pad']]
+
+    shapes=[]
+    annotations=[]
+    if recession:
+        for x0, x1, text, x, lo, hi in [
+            (2001.3, 2001.9, 'Tech Bust<br>Recession', 2001, 2001, 2002),
+            (2008, 2009, 'Great<br>Recession', 2008, 2008, 2009),
+            (2020, 2020.4, 'COVID<br>Recession', 2019.8, 2020, 2021),
+        ]:
+            if xmin<=lo and xmax>=hi:
+                shape, annotation=_recession(x0, x1, yheight, text, x)
+                shapes.append(shape)
+                annotations.append(annotation)
+
+    # Latest values
+    area_list=['United States', state_name, msa_name]
+    latest={name: series[name][1][-1] for name in area_list}
+    positions=_place(latest, yrange, lines=2 if yvarname=="Index" else 1)
+
+    offsets=_offsets(names, adjustments or {})
+    xvalue=max(s[0].max() for s in series.values())
+    if xvalue<2021:
+        xvalue=spec['label_xmin']
+    for name in area_list:
+        yvalue=series[name][1][-1].round(1)
+        if yvarname=="Unemployment Rate":
+            yvalue=f'{yvalue}%'
+        elif yvarname=="Index":
+            yvalue=f"<br>{yvalue} (CAGR={series[name][2][-1]}%)"
+        annotations.append(_label(
+            xvalue, positions[name]+offsets[name], f"<b>{name}, {yvalue}</b>",
+            colors[name], names[name], spec['label_xshift']
+        ))
+
+    layout=_layout(
+        'annual', title, xaxis_title, yaxis_title, yrange, shapes, annotations,
+        tickvals=list(range(xmin,xmax+1,1))
+    )
+    return {'data': traces, 'layout': layout}
+
+
+# Monthly line chart (Labor Market)
+def month_figure(
+    df, state_name, msa, yvarname, recession,
+    title=None, yaxis_title=None, xaxis_title=None, adjustments=None):
+
+    msa_name, colors, names=_areas(df, state_name, msa)
+    area=np.where(df['Area'].values==msa, msa_name, df['Area'].values)
+    dates=pd.DatetimeIndex(df['Date'].values)
+    values=df[yvarname].values
+
+    # Areas in order of appearance
+    series={}
+    for name in pd.unique(area):
+        rows=area==name
+        series[name]=(dates[rows], values[rows])
+
+    traces=[
+        _trace(name, x, y, colors[name], MONTH_SYMBOLS[i], 'Date', yvarname)
+        for i, (name, (x, y)) in enumerate(series.items())
+    ]
+
+    ymin=values.min()
+    ymax=values.max()
+    yheight=ymax+(ymax-ymin)/12
+    if yvarname=="Index":
+        yrange=[min(ymin-10,90), yheight+5]
+    else:
+        yrange=[0, yheight+5]
+
+    shapes=[]
+    annotations=[]
+    if recession:
+        shape, annotation=_recession(
+            pd.to_datetime('2020-02-01'), pd.to_datetime('2020-04-01'), yheight,
+            'COVID<br>Recession', pd.to_datetime('2020-02-15'), yshift=25, ypad=0.5
+        )
+        shapes.append(shape)
+        annotations.append(annotation)
+
+    area_list=['United States', state_name, msa_name]
+    adjustments=adjustments or {}
+
+    # April 2020 and latest values
+    april=pd.Timestamp('2020-04-01')
+    latest_date=dates.max()
+    for date, x, suffix, sep, lines in [
+        (april, pd.to_datetime('2020-06-01'), '_apr', ' ', 1),
+        (latest_date, latest_date, '_m', ' <br>', 2),
+    ]:
+        point={name: series[name][1][series[name][0]==date][0] for name in area_list}
+        positions=_place(point, yrange, lines)
+
+        label_names={area: name+suffix for area, name in names.items()}
+        offsets=_offsets(label_names, adjustments)
+        month_abbrev=date.month_name()[0:3]
+        for name in area_list:
+            yvalue=point[name].round(1)
+            annotations.append(_label(
+                x, positions[name]+offsets[name],
+                f"<b>{name}{sep}({month_abbrev} {date.year}), {yvalue}</b>",
+                colors[name], label_names[name], 25
+            ))
+
+    layout=_layout('monthly', title, xaxis_title, yaxis_title, yrange, shapes, annotations)
+    return {'data': traces, 'layout': layout}
@@ -0,0 +1,101 @@
+import argparse
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATASETS
+from snapshot import SNAPSHOT_DIR, load_dataset, read_manifest, update_snapshot
+
+logger=logging.getLogger(__name__)
+
+
+def _same(a, b):
+    if a.dtype.kind in 'fc' or b.dtype.kind in 'fc':
+        a=a.astype(float)
+        b=b.astype(float)
+        return (a==b) | (np.isnan(a) & np.isnan(b))
+    return a==b
+
+
+def merge_delta(df, delta, keys):
+    """Upsert the rows of ``delta`` into ``df`` on ``keys``.
+
+    Returns the merged frame and a report of the keys that were added or
+    revised. Rows of ``delta`` identical to those stored count as unchanged.
+    """
+    missing=set(df.columns)-set(delta.columns)
+    if missing:
+        raise ValueError(f'Delta is missing columns {sorted(missing)}')
+    delta=delta[list(df.columns)].copy()
+    for col in df.columns:
+        if df[col].dtype==object:
+            delta[col]=delta[col].astype(str)
+        else:
+            delta[col]=delta[col].astype(df[col].dtype)
+    if delta.duplicated(keys).any():
+        raise ValueError(f'Delta has more than one row per {" and ".join(keys)}')
+
+    positions=pd.MultiIndex.from_frame(df[keys]).get_indexer(pd.MultiIndex.from_frame(delta[keys]))
+    existing=positions>=0
+    changed=np.zeros(len(delta), dtype=bool)
+    for col in df.columns:
+        changed[existing]|=~_same(df[col].values[positions[existing]], delta[col].values[existing])
+    revised=existing & changed
+    added=~existing
+
+    merged=df.copy()
+    for col in df.columns:
+        values=merged[col].values.copy()
+        values[positions[revised]]=delta[col].values[revised]
+        merged[col]=values
+    merged=pd.concat([merged, delta[added]], ignore_index=True)
+
+    changed_rows=delta[revised | added]
+    report={
+        'keys': keys,
+        'rows_added': int(added.sum()),
+        'rows_revised': int(revised.sum()),
+        'rows_unchanged': int((existing & ~changed).sum()),
+        'areas': sorted(changed_rows['Area'].astype(str).unique()),
+        'periods': sorted(changed_rows[keys[1]].astype(str).unique()),
+        'added': delta.loc[added, keys].astype(str).values.tolist(),
+        'revised': delta.loc[revised, keys].astype(str).values.tolist(),
+    }
+    return merged, report
+
+
+# Merge a delta file into the current snapshot as a new version
+def ingest(name, path, snapshot_dir=SNAPSHOT_DIR):
+    manifest=read_manifest(snapshot_dir)
+    df=load_dataset(name, manifest, snapshot_dir)
+    delta=pd.read_csv(path)
+    merged, report=merge_delta(df, delta, ['Area', DATASETS[name]['datevar']])
+    report['dataset']=name
+    report['base']=manifest['version']
+    if not report['rows_added'] and not report['rows_revised']:
+        report['version']=manifest['version']
+        return report
+    report['version']=update_snapshot(
+        {name: merged}, snapshot_dir,
+        changes={name: {'areas': report['areas'], 'periods': report['periods']}}
+    )
+    return report
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Merge new or revised rows into the data snapshot.')
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('delta', help='CSV with the columns of the dataset, e.g. a new LAUS month')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR)
+    args=parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    report=ingest(args.dataset, args.delta, args.snapshot_dir)
+    logger.info(
+        '%s: %d rows added, %d revised, %d unchanged in %d areas; snapshot %s',
+        args.dataset, report['rows_added'], report['rows_revised'], report['rows_unchanged'],
+        len(report['areas']), report['version']
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,116 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+
+# Latency buckets, in seconds
+BUCKETS=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """Cumulative histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name=name
+        self.help=help
+        self.labels=tuple(labels)
+        self.buckets=tuple(buckets)
+        self._series={}
+        self._lock=threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key=tuple(labels[name] for name in self.labels)
+        i=bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series=self._series.get(key)
+            if series is None:
+                series=self._series[key]=[[0] * (len(self.buckets)+1), 0.0]
+            series[0][i]+=1
+            series[1]+=seconds
+
+    # Count and total seconds of each label set
+    def totals(self):
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self, **constant):
+        lines=[f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series=[(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for key, counts, total in series:
+            pairs=list(zip(self.labels, key)) + list(constant.items())
+            cumulative=0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative+=count
+                lines.append(f'{self.name}_bucket{_labels(pairs + [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(pairs)} {total}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {cumulative}')
+        return '\n'.join(lines)
+
+
+CALLBACK_SECONDS=Histogram(
+    'econapp_callback_seconds', 'Time spent in a Dash callback.', ['callback', 'dataset']
+)
+STAGE_SECONDS=Histogram(
+    'econapp_callback_stage_seconds', 'Time spent in one stage of a Dash callback.',
+    ['callback', 'dataset', 'stage']
+)
+
+# Callback and dataset being timed in this context
+_current=contextvars.ContextVar('metrics_callback', default=None)
+
+
+def timed(dataset):
+    """Time a callback; stages entered while it runs are labelled with it."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            token=_current.set((func.__name__, dataset))
+            start_time=time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                CALLBACK_SECONDS.observe(
+                    time.perf_counter()-start_time, callback=func.__name__, dataset=dataset
+                )
+                _current.reset(token)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def stage(name):
+    current=_current.get()
+    if current is None:
+        yield
+        return
+    start_time=time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(
+            time.perf_counter()-start_time, callback=current[0], dataset=current[1], stage=name
+        )
+
+
+# Every histogram of this worker, labelled with its pid
+def render():
+    worker=os.getpid()
+    return '\n'.join(
+        histogram.render(worker=worker) for histogram in (CALLBACK_SECONDS, STAGE_SECONDS)
+    ) + '\n'
@@ -0,0 +1,414 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Layout of saved GrowthTables and AnnualPanel files
+TABLES_FORMAT=1
+
+
+def annualize(values, mask, years):
+    """Calendar-year means and end-of-year values of an area x period matrix.
+
+    ``years`` is the (sorted) year of each column. Returns the distinct years,
+    the mean and the last observed value of each area in each year, and
+    whether the area has any observation in that year.
+    """
+    unique, starts=np.unique(years, return_index=True)
+    lengths=np.diff(np.append(starts, len(years)))
+
+    # Kahan-compensated sums, period by period within each year (as pandas does)
+    shape=(mask.shape[0], len(unique))
+    sums=np.zeros(shape)
+    compensation=np.zeros(shape)
+    counts=np.zeros(shape, dtype=np.int64)
+    for k in range(lengths.max()):
+        blocks=k<lengths
+        observed=mask[:, starts[blocks]+k]
+        y=values[:, starts[blocks]+k]-compensation[:, blocks]
+        t=sums[:, blocks]+y
+        compensation[:, blocks]=np.where(observed, (t-sums[:, blocks])-y, compensation[:, blocks])
+        sums[:, blocks]=np.where(observed, t, sums[:, blocks])
+        counts[:, blocks]+=observed
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means=sums / counts
+
+    columns=np.where(mask, np.arange(mask.shape[1]), -1)
+    last_column=np.maximum.reduceat(columns, starts, axis=1)
+    last=np.take_along_axis(values, np.maximum(last_column, 0), axis=1)
+    last[last_column<0]=np.nan
+    return unique, means, last, counts>0
+
+
+def annualize_update(values, mask, years, previous, changed_years):
+    """``annualize``, recomputing only ``changed_years`` and years that ``previous``
+    (an earlier result for the same areas) does not have."""
+    unique=np.unique(years)
+    previous_years, previous_means, previous_last, previous_any=previous
+    redo=np.isin(unique, changed_years) | ~np.isin(unique, previous_years)
+
+    shape=(mask.shape[0], len(unique))
+    means=np.empty(shape)
+    last=np.empty(shape)
+    any_observed=np.empty(shape, dtype=bool)
+    keep=np.searchsorted(previous_years, unique[~redo])
+    means[:, ~redo]=previous_means[:, keep]
+    last[:, ~redo]=previous_last[:, keep]
+    any_observed[:, ~redo]=previous_any[:, keep]
+
+    cols=np.isin(years, unique[redo])
+    if cols.any():
+        _, means[:, redo], last[:, redo], any_observed[:, redo]=annualize(
+            values[:, cols], mask[:, cols], years[cols]
+        )
+    return unique, means, last, any_observed
+
+
+def _changed_years(previous_cube, cube, changed):
+    """Years of ``cube`` that may differ from ``previous_cube``: those of the
+    ``changed`` periods and those whose periods differ. None if the areas differ
+    or nothing is known about the changes, in which case nothing is reused."""
+    if previous_cube is None or changed is None:
+        return None
+    if previous_cube.variables!=cube.variables or not np.array_equal(previous_cube.areas, cube.areas):
+        return None
+    years=set(pd.DatetimeIndex(changed).year)
+    for year in np.unique(cube.years):
+        if not cube.periods[cube.years==year].equals(previous_cube.periods[previous_cube.years==year]):
+            years.add(year)
+    return np.array(sorted(years), dtype=cube.years.dtype)
+
+
+# Named arrays as one .npy file each, with the names in tables.json
+def _save_arrays(path, kind, arrays, **meta):
+    os.makedirs(path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), values, allow_pickle=False)
+    with open(os.path.join(path, 'tables.json'), 'w') as f:
+        json.dump(dict(meta, format=TABLES_FORMAT, kind=kind, arrays=sorted(arrays)), f, indent=2)
+
+
+def _load_arrays(path, kind, mmap_mode):
+    with open(os.path.join(path, 'tables.json')) as f:
+        meta=json.load(f)
+    if meta['format']!=TABLES_FORMAT or meta['kind']!=kind:
+        raise ValueError(f"Unsupported {meta['kind']} tables format {meta['format']}")
+    return meta, {
+        name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in meta['arrays']
+    }
+
+
+class PanelCube:
+    """Dense area x period matrices for every numeric variable of a balanced panel.
+
+    Rows are areas (sorted), columns are periods (sorted dates). Cells with no
+    observation are NaN in the value matrices and False in ``mask``.
+    """
+
+    CUBE_FORMAT=1
+
+    def __init__(self, df, variables=None):
+        if variables is None:
+            variables=[
+                col for col in df.select_dtypes('number').columns
+                if col!='Year'
+            ]
+
+        area_codes, areas=pd.factorize(df['Area'], sort=True)
+        period_codes, periods=pd.factorize(df['Date'], sort=True)
+        shape=(len(areas), len(periods))
+
+        self._set_axes(np.asarray(areas, dtype=object), pd.DatetimeIndex(periods))
+
+        self.mask=np.zeros(shape, dtype=bool)
+        self.mask[area_codes, period_codes]=True
+        if self.mask.sum()!=len(df):
+            raise ValueError('Panel has more than one row per Area and Date')
+
+        self.types=np.empty(len(areas), dtype=object)
+        self.types[area_codes]=df['Type'].values
+
+        self.variables=list(variables)
+        self.dtypes={}
+        self.values={}
+        for var in self.variables:
+            arr=np.full(shape, np.nan)
+            arr[area_codes, period_codes]=df[var].values
+            self.dtypes[var]=df[var].dtype
+            self.values[var]=arr
+
+    def _set_axes(self, areas, periods):
+        self.areas=areas
+        self.area_index={area: i for i, area in enumerate(self.areas)}
+        self.periods=periods
+        self.years=self.periods.year.values
+
+    # One .npy file per matrix, so that other processes can map them
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'areas.npy'), self.areas.astype(str), allow_pickle=False)
+        np.save(os.path.join(path, 'types.npy'), self.types.astype(str), allow_pickle=False)
+        np.save(os.path.join(path, 'periods.npy'), self.periods.values, allow_pickle=False)
+        np.save(os.path.join(path, 'mask.npy'), self.mask, allow_pickle=False)
+        variables=[]
+        for i, var in enumerate(self.variables):
+            file=f'{i:03d}.npy'
+            np.save(os.path.join(path, file), self.values[var], allow_pickle=False)
+            variables.append({'name': var, 'file': file, 'dtype': self.dtypes[var].str})
+        with open(os.path.join(path, 'cube.json'), 'w') as f:
+            json.dump({'format': self.CUBE_FORMAT, 'variables': variables}, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Open a saved cube; with ``mmap_mode='r'`` the matrices stay in the page cache,
+        shared by every process that maps them."""
+        with open(os.path.join(path, 'cube.json')) as f:
+            meta=json.load(f)
+        if meta['format']!=cls.CUBE_FORMAT:
+            raise ValueError(f"Unsupported cube format {meta['format']}")
+
+        def read(file, mmap=None):
+            return np.load(os.path.join(path, file), mmap_mode=mmap, allow_pickle=False)
+
+        cube=cls.__new__(cls)
+        # Area names are few; intern them so every lookup shares one string
+        areas=np.array([sys.intern(str(area)) for area in read('areas.npy')], dtype=object)
+        cube._set_axes(areas, pd.DatetimeIndex(read('periods.npy')))
+        cube.types=read('types.npy').astype(object)
+        cube.mask=read('mask.npy', mmap_mode)
+        cube.variables=[var['name'] for var in meta['variables']]
+        cube.dtypes={var['name']: np.dtype(var['dtype']) for var in meta['variables']}
+        cube.values={var['name']: read(var['file'], mmap_mode) for var in meta['variables']}
+        return cube
+
+    def row(self, area):
+        return self.area_index[area]
+
+    def rows(self, areas):
+        return np.array([self.area_index[area] for area in areas], dtype=int)
+
+    def type_of(self, area):
+        return self.types[self.area_index[area]]
+
+    def period_slice(self, start_year=None, end_year=None):
+        lo=0 if start_year is None else np.searchsorted(self.years, start_year, side='left')
+        hi=len(self.years) if end_year is None else np.searchsorted(self.years, end_year, side='right')
+        return slice(lo, hi)
+
+    def series(self, area, variable, start_year=None, end_year=None):
+        cols=self.period_slice(start_year, end_year)
+        i=self.area_index[area]
+        observed=self.mask[i, cols]
+        return self.periods[cols][observed], self.values[variable][i, cols][observed]
+
+    # Long-format frame for a handful of areas, in the order given
+    def frame(self, areas, variables=None, start_year=None, end_year=None):
+        if variables is None:
+            variables=self.variables
+        rows=self.rows(areas)
+        cols=self.period_slice(start_year, end_year)
+        r, c=np.nonzero(self.mask[rows, cols])
+        periods=self.periods[cols][c]
+
+        df=pd.DataFrame({
+            'Area': self.areas[rows][r],
+            'Date': periods,
+            'Year': periods.year.values,
+            'Type': self.types[rows][r],
+        })
+        for var in variables:
+            df[var]=self.values[var][rows, cols][r, c].astype(self.dtypes[var])
+        return df
+
+
+class GrowthTables:
+    """Growth index and CAGR of every area and variable of a cube over one window.
+
+    Matches calc_index/calc_CAGR: the index is rebased on the first period of
+    the window and rounded to 3 decimals; CAGR runs from the first period to
+    the first period of the final year and is rounded to 2 decimals.
+
+    Given the tables of an earlier version of the cube (``previous``) and the
+    periods that changed since, only the index of changed periods and the
+    annual means of changed years are recomputed, as long as the base period
+    is unchanged.
+    """
+
+    def __init__(self, cube, start_year=None, end_year=None, previous=None, changed=None):
+        self.cube=cube
+        self.start_year=start_year
+        self.end_year=end_year
+        self.cols=cube.period_slice(start_year, end_year)
+
+        periods=cube.periods[self.cols]
+        years=cube.years[self.cols]
+        t=years.max()-years.min()
+        last=np.searchsorted(years, years.max(), side='left')
+
+        changed_years=_changed_years(previous and previous.cube, cube, changed)
+        if changed_years is not None:
+            previous_periods=previous.cube.periods[previous.cols]
+            if periods[0]!=previous_periods[0] or periods[0] in pd.DatetimeIndex(changed):
+                changed_years=None
+        if changed_years is not None:
+            position=previous_periods.get_indexer(periods)
+            redo=(position<0) | periods.isin(changed)
+
+        self.index={}
+        self.cagr={}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for var in cube.variables:
+                values=cube.values[var][:, self.cols]
+                if changed_years is None:
+                    index=np.round(values / values[:, :1] * 100, 3)
+                else:
+                    index=np.empty(values.shape)
+                    index[:, ~redo]=previous.index[var][:, position[~redo]]
+                    index[:, redo]=np.round(values[:, redo] / values[:, :1] * 100, 3)
+                self.index[var]=index
+                self.cagr[var]=np.round(((index[:, last]/index[:, 0])**(1/t)-1) * 100, 2)
+
+        # Calendar-year means over the window, for the annual charts
+        mask=cube.mask[:, self.cols]
+        self.annual_values={}
+        self.annual_index={}
+        self.annual_cagr={}
+
+        # Means of unchanged years are taken from the previous tables
+        def update(values, means):
+            return annualize_update(
+                values, mask, years,
+                (previous.annual_years, means, means, previous.annual_mask), changed_years
+            )
+
+        for var in cube.variables:
+            cagr=np.broadcast_to(self.cagr[var][:, None], mask.shape)
+            if changed_years is None:
+                self.annual_years, self.annual_values[var], _, self.annual_mask=annualize(
+                    cube.values[var][:, self.cols], mask, years
+                )
+                _, self.annual_index[var], _, _=annualize(self.index[var], mask, years)
+                _, self.annual_cagr[var], _, _=annualize(cagr, mask, years)
+                continue
+            self.annual_years, self.annual_values[var], _, self.annual_mask=update(
+                cube.values[var][:, self.cols], previous.annual_values[var]
+            )
+            _, self.annual_index[var], _, _=update(self.index[var], previous.annual_index[var])
+            if np.array_equal(self.cagr[var], previous.cagr[var], equal_nan=True):
+                _, self.annual_cagr[var], _, _=update(cagr, previous.annual_cagr[var])
+            else:
+                _, self.annual_cagr[var], _, _=annualize(cagr, mask, years)
+
+    def save(self, path):
+        arrays={'annual_years': self.annual_years, 'annual_mask': self.annual_mask}
+        for i, var in enumerate(self.cube.variables):
+            arrays[f'index-{i:03d}']=self.index[var]
+            arrays[f'cagr-{i:03d}']=self.cagr[var]
+            arrays[f'annual_values-{i:03d}']=self.annual_values[var]
+            arrays[f'annual_index-{i:03d}']=self.annual_index[var]
+            arrays[f'annual_cagr-{i:03d}']=self.annual_cagr[var]
+        _save_arrays(path, 'growth', arrays, start_year=self.start_year, end_year=self.end_year)
+
+    @classmethod
+    def load(cls, cube, path, mmap_mode='r'):
+        """Open tables saved for ``cube``; with ``mmap_mode='r'`` they are shared like the cube."""
+        meta, arrays=_load_arrays(path, 'growth', mmap_mode)
+        tables=cls.__new__(cls)
+        tables.cube=cube
+        tables.start_year=meta['start_year']
+        tables.end_year=meta['end_year']
+        tables.cols=cube.period_slice(tables.start_year, tables.end_year)
+        tables.annual_years=arrays['annual_years']
+        tables.annual_mask=arrays['annual_mask']
+        for attr in ('index', 'cagr', 'annual_values', 'annual_index', 'annual_cagr'):
+            setattr(tables, attr, {var: arrays[f'{attr}-{i:03d}'] for i, var in enumerate(cube.variables)})
+        return tables
+
+    # Long-format frame with Index and CAGR columns for a handful of areas
+    def frame(self, areas, variable):
+        df=self.cube.frame(areas, [variable], self.start_year, self.end_year)
+        rows=self.cube.rows(areas)
+        r, c=np.nonzero(self.cube.mask[rows, self.cols])
+        df['Index']=self.index[variable][rows][r, c]
+        df['CAGR']=self.cagr[variable][rows][r]
+        return df
+
+    # Same, one row per area and calendar year (annual means)
+    def annual_frame(self, areas, variable):
+        rows=self.cube.rows(areas)
+        r, c=np.nonzero(self.annual_mask[rows])
+        df=_annual_frame(self.cube, rows, r, self.annual_years[c])
+        df[variable]=self.annual_values[variable][rows][r, c]
+        df['Index']=self.annual_index[variable][rows][r, c]
+        df['CAGR']=self.annual_cagr[variable][rows][r, c]
+        return df
+
+
+def _annual_frame(cube, rows, r, years):
+    return pd.DataFrame({
+        'Area': cube.areas[rows][r],
+        'Date': pd.to_datetime(years.astype(str), format='%Y'),
+        'Year': years,
+        'Type': cube.types[rows][r],
+    })
+
+
+class AnnualPanel:
+    """Calendar-year means and end-of-year values of every variable of a cube.
+
+    Built once per dataset so that monthly series never need resampling at
+    request time. For annual datasets both are the values themselves. Given
+    the panel of an earlier version of the cube and the periods that changed
+    since, only the changed years are recomputed.
+    """
+
+    def __init__(self, cube, previous=None, changed=None):
+        self.cube=cube
+        self.mean={}
+        self.last={}
+        changed_years=_changed_years(previous and previous.cube, cube, changed)
+        for var in cube.variables:
+            if changed_years is None:
+                result=annualize(cube.values[var], cube.mask, cube.years)
+            else:
+                result=annualize_update(
+                    cube.values[var], cube.mask, cube.years,
+                    (previous.years, previous.mean[var], previous.last[var], previous.mask),
+                    changed_years
+                )
+            self.years, self.mean[var], self.last[var], self.mask=result
+
+    def save(self, path):
+        arrays={'years': self.years, 'mask': self.mask}
+        for i, var in enumerate(self.cube.variables):
+            arrays[f'mean-{i:03d}']=self.mean[var]
+            arrays[f'last-{i:03d}']=self.last[var]
+        _save_arrays(path, 'annual', arrays)
+
+    @classmethod
+    def load(cls, cube, path, mmap_mode='r'):
+        _, arrays=_load_arrays(path, 'annual', mmap_mode)
+        panel=cls.__new__(cls)
+        panel.cube=cube
+        panel.years=arrays['years']
+        panel.mask=arrays['mask']
+        panel.mean={var: arrays[f'mean-{i:03d}'] for i, var in enumerate(cube.variables)}
+        panel.last={var: arrays[f'last-{i:03d}'] for i, var in enumerate(cube.variables)}
+        return panel
+
+    # Long-format frame with one row per area and year, in the order given
+    def frame(self, areas, variables=None, start_year=None, end_year=None, how='mean'):
+        if variables is None:
+            variables=self.cube.variables
+        values=self.mean if how=='mean' else self.last
+        rows=self.cube.rows(areas)
+        lo=0 if start_year is None else np.searchsorted(self.years, start_year, side='left')
+        hi=len(self.years) if end_year is None else np.searchsorted(self.years, end_year, side='right')
+        r, c=np.nonzero(self.mask[rows, lo:hi])
+        df=_annual_frame(self.cube, rows, r, self.years[lo:hi][c])
+        for var in variables:
+            df[var]=values[var][rows, lo:hi][r, c]
+        return df
@@ -0,0 +1,185 @@
+import cProfile
+import datetime
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import request
+
+from cache import bypass
+
+PROFILE_DIR=os.environ.get(
+    'ECONAPP_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'profiles')
+)
+MODES=('cprofile', 'sample')
+
+
+class StackSampler:
+    """Samples the stack of one thread, counting collapsed stacks for flame graphs."""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id=thread_id
+        self.interval=interval
+        self.counts=Counter()
+        self._stop=threading.Event()
+        self._thread=threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame=sys._current_frames().get(self.thread_id)
+            stack=[]
+            while frame is not None:
+                code=frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame=frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))]+=1
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+class CallbackProfiler:
+    """Profiles single Dash callback requests on demand.
+
+    A request is profiled when it carries an ``X-Profile`` header (set to a
+    mode) and passes ``allowed``, or when it is the next one to match a
+    request armed with ``arm``. Armed requests are files under
+    ``<profile_dir>/armed``, so any gunicorn worker can take one; a worker
+    claims it by renaming the file, which only one rename can do. The figure
+    cache is bypassed so the callback body runs. cProfile runs are saved as
+    .pstats, sampled runs as collapsed stacks (.collapsed), each with a .json
+    description.
+    """
+
+    def __init__(self, profile_dir=PROFILE_DIR):
+        self.profile_dir=profile_dir
+        self.armed_dir=os.path.join(profile_dir, 'armed')
+
+    def arm(self, callback=None, match=None, mode='cprofile'):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profile mode {mode!r}')
+        spec={'callback': callback, 'match': match, 'mode': mode}
+        os.makedirs(self.armed_dir, exist_ok=True)
+        stamp=datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        name=f'{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        tmp=os.path.join(self.armed_dir, '.' + name)
+        with open(tmp, 'w') as f:
+            json.dump(spec, f)
+        os.replace(tmp, os.path.join(self.armed_dir, name))
+        return spec
+
+    # Armed files, oldest first, with their specs
+    def _armed_files(self):
+        try:
+            names=sorted(name for name in os.listdir(self.armed_dir) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+        armed=[]
+        for name in names:
+            path=os.path.join(self.armed_dir, name)
+            try:
+                with open(path) as f:
+                    armed.append((path, json.load(f)))
+            except (FileNotFoundError, ValueError):
+                # Taken by another worker meanwhile
+                continue
+        return armed
+
+    def armed(self):
+        return [spec for _, spec in self._armed_files()]
+
+    # First armed request matching this callback output and inputs, if any
+    def _take(self, output, inputs):
+        for path, spec in self._armed_files():
+            if spec['callback'] and spec['callback'] not in output:
+                continue
+            if spec['match'] and spec['match'] not in inputs:
+                continue
+            claimed=f'{path}.{os.getpid()}.taken'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            os.remove(claimed)
+            return spec
+        return None
+
+    def wrap(self, view, allowed):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            body=request.get_json(silent=True) or {}
+            output=str(body.get('output', ''))
+            inputs=json.dumps(body.get('inputs', []))
+            mode=request.headers.get('X-Profile')
+            if mode and allowed():
+                spec={'callback': None, 'match': None, 'mode': mode if mode in MODES else 'cprofile'}
+            else:
+                spec=self._take(output, inputs)
+            if spec is None:
+                return view(*args, **kwargs)
+            return self._profile(spec, output, body.get('inputs', []), view, args, kwargs)
+        return wrapper
+
+    def _profile(self, spec, output, inputs, view, args, kwargs):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp=datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        name=f"{stamp}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9]+', '_', output).strip('_')[:60]}"
+        base=os.path.join(self.profile_dir, name)
+
+        start_time=time.perf_counter()
+        with bypass():
+            if spec['mode']=='sample':
+                with StackSampler(threading.get_ident()) as sampler:
+                    response=view(*args, **kwargs)
+                files=[name+'.collapsed']
+                with open(base+'.collapsed', 'w') as f:
+                    f.write(sampler.collapsed())
+            else:
+                profile=cProfile.Profile()
+                profile.enable()
+                try:
+                    response=view(*args, **kwargs)
+                finally:
+                    profile.disable()
+                files=[name+'.pstats']
+                profile.dump_stats(base+'.pstats')
+        seconds=time.perf_counter()-start_time
+
+        with open(base+'.json', 'w') as f:
+            json.dump({
+                'name': name,
+                'mode': spec['mode'],
+                'output': output,
+                'inputs': inputs,
+                'seconds': round(seconds, 4),
+                'worker': os.getpid(),
+                'files': files,
+            }, f, indent=2)
+        return response
+
+    def profiles(self):
+        if not os.path.isdir(self.profile_dir):
+            return []
+        listing=[]
+        for file in sorted(os.listdir(self.profile_dir), reverse=True):
+            if file.endswith('.json'):
+                with open(os.path.join(self.profile_dir, file)) as f:
+                    listing.append(json.load(f))
+        return listing
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+
+def categorical(codes, categories):
+    """Categorical from dictionary codes, with its categories in sorted order.
+
+    Sorted categories keep ``pd.factorize(..., sort=True)`` and ``sort_values``
+    in alphabetical order, as they are for plain string columns.
+    """
+    categories=np.asarray(categories)
+    order=np.argsort(categories, kind='stable')
+    rank=np.empty(len(order), dtype=np.int32)
+    rank[order]=np.arange(len(order), dtype=np.int32)
+    return pd.Categorical.from_codes(rank[codes], categories[order].astype(object))
+
+
+def downcast(values):
+    """Smallest integer type that holds ``values``; float32 only where it is exact."""
+    if values.dtype.kind in 'iu':
+        return pd.to_numeric(values, downcast='integer')
+    if values.dtype.kind=='f' and values.dtype.itemsize>4:
+        compact=values.astype(np.float32)
+        same=(compact.astype(values.dtype)==values) | np.isnan(values)
+        if same.all():
+            return compact
+    return values
+
+
+def compact(df):
+    """``df`` with every numeric column downcast (see ``downcast``)."""
+    columns={}
+    for col in df.select_dtypes('number').columns:
+        values=downcast(df[col].values)
+        if values.dtype!=df[col].dtype:
+            columns[col]=values
+    return df.assign(**columns) if columns else df
+
+
+def memory_usage(df):
+    """Bytes held by each column of ``df``, including the strings of object columns."""
+    usage=df.memory_usage(index=False, deep=True)
+    return {col: int(size) for col, size in usage.items()}
@@ -0,0 +1,271 @@
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks on Windows; concurrent first builds then both publish
+    fcntl=None
+
+import numpy as np
+import pandas as pd
+
+from fetch import read_sources
+from schema import categorical, downcast
+
+logger=logging.getLogger(__name__)
+
+# Snapshot location
+SNAPSHOT_DIR=os.environ.get(
+    'ECONAPP_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshot')
+)
+SNAPSHOT_FORMAT=1
+
+# Raw data sources; point ECONAPP_DATA_URL at a mirror (or a local stub server)
+DATA_URL=os.environ.get(
+    'ECONAPP_DATA_URL', 'https://raw.githubusercontent.com/garycl/EconApp/master/data'
+).rstrip('/')
+DATA_URLS={name: f'{DATA_URL}/{name}.csv' for name in ('pop', 'lau', 'bea', 'qcew')}
+
+
+def _sha256(path):
+    h=hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _save(path, values):
+    np.save(path, values, allow_pickle=False)
+    return _sha256(path)
+
+
+# One .npy file per column of df, under <tmp_dir>/<name>/
+def _write_dataset(tmp_dir, name, df):
+    os.makedirs(os.path.join(tmp_dir, name))
+    columns=[]
+    for i, col in enumerate(df.columns):
+        entry={'name': col, 'file': f'{name}/{i:03d}.npy'}
+        if df[col].dtype==object:
+            # Strings are dictionary encoded so no pickling is needed
+            codes, categories=pd.factorize(df[col].fillna('').astype(str))
+            entry['categories']=f'{name}/{i:03d}.categories.npy'
+            entry['categories_sha256']=_save(
+                os.path.join(tmp_dir, entry['categories']),
+                categories.values.astype(str)
+            )
+            values=codes.astype(np.int32)
+        else:
+            values=df[col].values
+        entry['dtype']=values.dtype.str
+        entry['sha256']=_save(os.path.join(tmp_dir, entry['file']), values)
+        columns.append(entry)
+    return columns
+
+
+def dataset_digest(entry):
+    """Digest of the column checksums of one manifest dataset entry."""
+    h=hashlib.sha256()
+    for col in entry['columns']:
+        h.update(col['sha256'].encode())
+        h.update(col.get('categories_sha256', '').encode())
+    return h.hexdigest()[:12]
+
+
+# Write the manifest, move the build into place and make it current
+def _publish(tmp_dir, datasets, snapshot_dir):
+    # Version is a digest of every column checksum
+    h=hashlib.sha256()
+    for name in sorted(datasets):
+        for col in datasets[name]['columns']:
+            h.update(col['sha256'].encode())
+            h.update(col.get('categories_sha256', '').encode())
+    version=h.hexdigest()[:12]
+
+    manifest={
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'created': datetime.datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'datasets': datasets
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    version_dir=os.path.join(snapshot_dir, version)
+    if os.path.isdir(version_dir):
+        shutil.rmtree(tmp_dir)
+    else:
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            # Another process published the same version first; the
+            # version is a digest of the contents, so its copy is the same
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(version_dir):
+                raise
+    _set_current(snapshot_dir, version)
+    return version
+
+
+# Write one snapshot version
+def build_snapshot(sources=None, snapshot_dir=SNAPSHOT_DIR):
+    if sources is None:
+        sources=DATA_URLS
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_dir=tempfile.mkdtemp(prefix='.build-', dir=snapshot_dir)
+    try:
+        datasets={}
+        for name, (df, status) in read_sources(sources).items():
+            columns=_write_dataset(tmp_dir, name, df)
+            datasets[name]={'source': sources[name], 'fetch': status, 'rows': len(df), 'columns': columns}
+        version=_publish(tmp_dir, datasets, snapshot_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info('Built data snapshot %s in %s', version, snapshot_dir)
+    return version
+
+
+def ensure_snapshot(snapshot_dir=SNAPSHOT_DIR, sources=None):
+    """Build a snapshot unless one exists; returns the current version.
+
+    Processes starting together (gunicorn workers) take a file lock, so the
+    first builds the snapshot and the others wait for it and use it.
+    """
+    version=current_version(snapshot_dir)
+    if version is not None:
+        return version
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, '.build.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        version=current_version(snapshot_dir)
+        if version is None:
+            version=build_snapshot(sources, snapshot_dir)
+    return version
+
+
+def update_snapshot(frames, snapshot_dir=SNAPSHOT_DIR, changes=None):
+    """Write a version where the datasets in ``frames`` are replaced.
+
+    The files of every other dataset are hard linked from the current
+    version. ``changes`` maps a dataset to a summary of what changed, kept
+    in its manifest entry together with the digest it was applied to.
+    """
+    manifest=read_manifest(snapshot_dir)
+    base_dir=os.path.join(snapshot_dir, manifest['version'])
+    tmp_dir=tempfile.mkdtemp(prefix='.update-', dir=snapshot_dir)
+    try:
+        datasets={}
+        for name, entry in manifest['datasets'].items():
+            if name in frames:
+                df=frames[name]
+                entry=dict(entry, rows=len(df), columns=_write_dataset(tmp_dir, name, df))
+                entry.pop('changes', None)
+                if changes and name in changes:
+                    entry['changes']=dict(changes[name], base=dataset_digest(manifest['datasets'][name]))
+            else:
+                os.makedirs(os.path.join(tmp_dir, name))
+                for col in entry['columns']:
+                    for file in (col['file'], col.get('categories')):
+                        if file is not None:
+                            _link(os.path.join(base_dir, file), os.path.join(tmp_dir, file))
+            datasets[name]=entry
+        version=_publish(tmp_dir, datasets, snapshot_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info('Updated data snapshot %s to %s in %s', manifest['version'], version, snapshot_dir)
+    return version
+
+
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _set_current(snapshot_dir, version):
+    fd, tmp=tempfile.mkstemp(prefix='.CURRENT-', dir=snapshot_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(snapshot_dir, 'CURRENT'))
+
+
+def current_version(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR, version=None):
+    if version is None:
+        version=current_version(snapshot_dir)
+    if version is None:
+        raise FileNotFoundError(f'No data snapshot in {snapshot_dir}')
+    with open(os.path.join(snapshot_dir, version, 'manifest.json')) as f:
+        manifest=json.load(f)
+    if manifest['format']!=SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {manifest['format']}")
+    return manifest
+
+
+def _load(version_dir, file, sha256, verify):
+    path=os.path.join(version_dir, file)
+    if verify and _sha256(path)!=sha256:
+        raise ValueError(f'Checksum mismatch for {path}')
+    return np.load(path, allow_pickle=False)
+
+
+# Read one dataset from a snapshot; with compact=True strings stay categorical
+# and numbers are downcast where no precision is lost
+def load_dataset(name, manifest, snapshot_dir=SNAPSHOT_DIR, verify=True, compact=False):
+    version_dir=os.path.join(snapshot_dir, manifest['version'])
+    data={}
+    for col in manifest['datasets'][name]['columns']:
+        values=_load(version_dir, col['file'], col['sha256'], verify)
+        if 'categories' in col:
+            categories=_load(version_dir, col['categories'], col['categories_sha256'], verify)
+            if compact:
+                values=categorical(values, categories)
+            else:
+                values=categories.astype(object)[values]
+        elif compact:
+            values=downcast(values)
+        data[col['name']]=values
+    return pd.DataFrame(data)
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, version=None, verify=True):
+    manifest=read_manifest(snapshot_dir, version)
+    frames={
+        name: load_dataset(name, manifest, snapshot_dir, verify)
+        for name in manifest['datasets']
+    }
+    return frames, manifest
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Build a local data snapshot from the raw CSVs.')
+    parser.add_argument('--source-dir', help='read <name>.csv from this directory instead of GitHub')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR)
+    args=parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sources=None
+    if args.source_dir:
+        sources={name: os.path.join(args.source_dir, f'{name}.csv') for name in DATA_URLS}
+    print(build_snapshot(sources, args.snapshot_dir))
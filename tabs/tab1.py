@@ -23,15 +23,8 @@ CONTENT_STYLE={
     'padding': '20px 10px'
 }
 
-# Read data
-def create_layout(data):
-
-    msa_list=(
-        data.
-        loc[(data.Type!='Nation')&(data.Type!='State'), 'Area']
-        .sort_values()
-        .unique()
-    )
+# Area options are built once per dataset (areas.AreaIndex)
+def create_layout(msa_options):
 
     # Layout
     controls=dbc.Col([
@@ -39,7 +32,7 @@ def create_layout(data):
         dcc.Dropdown(
             id='msa_dropdown',
             value='New York-Newark-Jersey City, NY-NJ-PA',
-            options=[{'label':msa, 'value':msa} for msa in msa_list]
+            options=msa_options
         ),
         html.Br(),
         html.H5('Plot Recessions', style={'textAlign': 'center'}),
@@ -146,6 +139,7 @@ def create_layout(data):
         [
             html.Br(),
             dcc.Graph(id='graph-1'),
+            dcc.Store(id='graph-1-figure'),
             html.P('Source: Census Population and Housing'),
             html.Div(id="table-1")
         ],
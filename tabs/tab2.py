@@ -23,15 +23,8 @@ CONTENT_STYLE={
     'padding': '20px 10px'
 }
 
-# Read data
-def create_layout(data):
-
-    msa_list=(
-        data.
-        loc[(data.Type!='Nation')&(data.Type!='State'), 'Area']
-        .sort_values()
-        .unique()
-    )
+# Area options are built once per dataset (areas.AreaIndex)
+def create_layout(msa_options):
 
     # Layout
     controls=dbc.Col([
@@ -44,7 +37,7 @@ def create_layout(data):
         dcc.Dropdown(
             id='area_dropdown',
             value='New York-Newark-Jersey City, NY-NJ-PA',
-            options=[{'label':msa, 'value':msa} for msa in msa_list]
+            options=msa_options
         ),
         dcc.Dropdown(
             id='yvar_dropdown',
@@ -318,8 +311,10 @@ def create_layout(data):
         [
             html.Br(),
             dcc.Graph(id='graph-2'),
+            dcc.Store(id='graph-2-figure'),
             html.Br(),
             dcc.Graph(id='graph-month-2'),
+            dcc.Store(id='graph-month-2-figure'),
             html.P('Source: Bureau of Labor Statistics'),
             html.Div(id="table-2")
         ],